@@ -44,6 +44,12 @@ class Settings:
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     ENVIRONMENT = os.getenv('ENVIRONMENT', 'production')
     
+    # Bot Concurrency
+    # Batas update Telegram yang diproses paralel; juga dipakai untuk
+    # sizing default pool DB (sweet spot MySQL ~25-50 koneksi)
+    CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '128'))
+    _DB_POOL_DEFAULT = max(25, min(50, CONCURRENT_UPDATES))
+
     # Database Configuration
     DB_CONFIG = {
         'host': os.getenv('DB_HOST', 'localhost'),
@@ -52,7 +58,8 @@ class Settings:
         'password': os.getenv('DB_PASSWORD', ''),
         'database': os.getenv('DB_NAME', 'windows_installer'),
         'charset': os.getenv('DB_CHARSET', 'utf8mb4'),
-        'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+        'pool_size': int(os.getenv('DB_POOL_SIZE', str(_DB_POOL_DEFAULT))),
+        'pool_min_size': int(os.getenv('DB_POOL_MIN_SIZE', str(_DB_POOL_DEFAULT // 4))),
         'pool_max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', '20')),
         'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
         'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '3600')),
@@ -67,9 +74,21 @@ class Settings:
     RDP_PORT = 22  # Hardcoded karena semua provider buka port 22
     SSH_TIMEOUT = int(os.getenv('SSH_TIMEOUT', '120'))
     INSTALLATION_TIMEOUT = int(os.getenv('INSTALLATION_TIMEOUT', '1800'))  # 30 menit
+    MAX_CONCURRENT_INSTALLS = int(os.getenv('MAX_CONCURRENT_INSTALLS', '20'))
+    MAX_CONCURRENT_INSTALLS_PER_HOST = 4  # Jaga MaxStartups sshd target
     
     # User Settings
     SESSION_DURATION_HOURS = 24
+    SESSION_CACHE_TTL_SECONDS = 30
+    SESSION_CACHE_MAX_ENTRIES = 10000
+    SESSION_ACTIVITY_FLUSH_SECONDS = 30
+    INSTALL_STATS_FLUSH_SECONDS = 1.0
+    SESSION_CLEANUP_INTERVAL_SECONDS = 1800
+    ADMIN_CACHE_TTL_SECONDS = 60
+    STATS_CACHE_TTL_SECONDS = 30
+    BROADCAST_CONCURRENCY = 25
+    ADMIN_PANEL_CACHE_TTL_SECONDS = 10
+    METRICS_SAMPLE_INTERVAL_SECONDS = 5
     MIN_USERNAME_LENGTH = 3
     MIN_PASSWORD_LENGTH = 6
     MIN_RDP_PASSWORD_LENGTH = 8
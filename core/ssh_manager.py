@@ -5,6 +5,7 @@ Simplified dengan port 22 hardcoded untuk RDP
 
 import logging
 import asyncio
+from collections import OrderedDict
 from typing import Optional, Dict, Tuple, Any
 import asyncssh
 
@@ -13,6 +14,28 @@ from config.settings import Settings
 logger = logging.getLogger(__name__)
 
 
+def _connection_alive(conn: Optional[asyncssh.SSHClientConnection]) -> bool:
+    """Cek apakah koneksi SSH masih hidup (transport belum ditutup)"""
+    if conn is None:
+        return False
+    transport = getattr(conn, '_transport', None)
+    return transport is not None and not transport.is_closing()
+
+
+# Script gabungan cek spesifikasi: satu exec untuk semua field, output
+# dipisah per section marker supaya tidak bayar round-trip per command
+_SPECS_SCRIPT = '; '.join((
+    "echo '---RAM---'", Settings.SSH_COMMANDS['CHECK_RAM'],
+    "echo '---DISK---'", Settings.SSH_COMMANDS['CHECK_DISK'],
+    "echo '---CPU---'", Settings.SSH_COMMANDS['CHECK_CPU'],
+    "echo '---OS---'", Settings.SSH_COMMANDS['CHECK_OS'],
+    "echo '---OSFB---'", Settings.SSH_COMMANDS['CHECK_OS_FALLBACK'],
+    "echo '---BOOT---'", Settings.SSH_COMMANDS['CHECK_BOOT'],
+))
+
+
+
+
 class SSHManager:
     """Manager untuk koneksi SSH dan operasi VPS"""
     
@@ -20,10 +43,15 @@ class SSHManager:
         self.connections: Dict[str, asyncssh.SSHClientConnection] = {}
     
     async def connect(self, ip: str, password: str, username: str = 'root') -> Tuple[bool, str]:
-        """Buat koneksi SSH ke VPS"""
+        """Buat koneksi SSH ke VPS (reuse koneksi hidup jika ada)"""
         try:
+            # Koneksi dari pool masih hidup? Skip handshake
+            if _connection_alive(self.connections.get(ip)):
+                logger.info(f"Reusing live SSH connection to {ip}")
+                return True, "Connected"
+
             logger.info(f"Connecting to {ip} as {username}")
-            
+
             conn = await asyncio.wait_for(
                 asyncssh.connect(
                     ip,
@@ -31,6 +59,7 @@ class SSHManager:
                     password=password,
                     known_hosts=None,
                     keepalive_interval=30,
+                    keepalive_count_max=3,
                     login_timeout=60
                 ),
                 timeout=Settings.TIMEOUT_SSH_CONNECT
@@ -122,7 +151,11 @@ class SSHManager:
             return 'legacy'
     
     async def check_system_specs(self, ip: str) -> Dict[str, Any]:
-        """Cek spesifikasi sistem VPS"""
+        """Cek spesifikasi sistem VPS
+
+        Semua field dicek lewat satu exec bermarker (_SPECS_SCRIPT),
+        bukan satu round-trip SSH per command.
+        """
         specs = {
             'ram_mb': 0,
             'disk_gb': 0,
@@ -130,86 +163,68 @@ class SSHManager:
             'os_type': 'unknown',
             'boot_mode': 'unknown'
         }
-        
+
         if ip not in self.connections:
             logger.error(f"Not connected to {ip} for system check")
             return specs
-        
+
         try:
-            # Cek RAM
-            logger.info(f"Checking RAM for {ip}")
-            success, stdout, stderr = await self.execute(
-                ip,
-                Settings.SSH_COMMANDS['CHECK_RAM'],
-                timeout=30
+            logger.info(f"Checking system specs for {ip}")
+            sections = await asyncio.wait_for(
+                self._stream_sections(ip, _SPECS_SCRIPT),
+                timeout=60
             )
-            if success and stdout:
-                try:
-                    ram_value = stdout.strip()
-                    specs['ram_mb'] = int(ram_value)
-                    logger.info(f"RAM for {ip}: {specs['ram_mb']} MB")
-                except ValueError as e:
-                    logger.error(f"Failed to parse RAM value '{stdout}': {e}")
-            
-            # Cek Disk
-            logger.info(f"Checking disk for {ip}")
-            success, stdout, stderr = await self.execute(
-                ip,
-                Settings.SSH_COMMANDS['CHECK_DISK'],
-                timeout=30
-            )
-            if success and stdout:
-                try:
-                    disk_value = stdout.strip()
-                    specs['disk_gb'] = int(disk_value)
-                    logger.info(f"Disk for {ip}: {specs['disk_gb']} GB")
-                except ValueError as e:
-                    logger.error(f"Failed to parse disk value '{stdout}': {e}")
-            
-            # Cek CPU cores
-            logger.info(f"Checking CPU cores for {ip}")
-            success, stdout, stderr = await self.execute(
-                ip,
-                Settings.SSH_COMMANDS['CHECK_CPU'],
-                timeout=30
-            )
-            if success and stdout:
+
+            for key, section in (('ram_mb', 'RAM'), ('disk_gb', 'DISK'), ('cpu_cores', 'CPU')):
+                value = sections.get(section, '')
                 try:
-                    specs['cpu_cores'] = int(stdout.strip())
-                    logger.info(f"CPU cores for {ip}: {specs['cpu_cores']}")
+                    specs[key] = int(value)
                 except ValueError as e:
-                    logger.error(f"Failed to parse CPU cores '{stdout}': {e}")
-            
-            # Cek OS type
-            logger.info(f"Checking OS type for {ip}")
-            success, stdout, stderr = await self.execute(
-                ip,
-                Settings.SSH_COMMANDS['CHECK_OS'],
-                timeout=30
-            )
-            if success and stdout:
-                specs['os_type'] = stdout.strip().lower()
-                logger.info(f"OS type for {ip}: {specs['os_type']}")
+                    logger.error(f"Failed to parse {section} value '{value}': {e}")
+
+            # OS type, pakai fallback kalau check utama kosong
+            os_type = sections.get('OS') or sections.get('OSFB') or ''
+            if os_type:
+                specs['os_type'] = os_type.lower()
+
+            boot_mode = sections.get('BOOT', '').lower()
+            if boot_mode in Settings.SUPPORTED_BOOT_MODES:
+                specs['boot_mode'] = boot_mode
             else:
-                # Fallback check
-                success, stdout, stderr = await self.execute(
-                    ip,
-                    Settings.SSH_COMMANDS['CHECK_OS_FALLBACK'],
-                    timeout=30
-                )
-                if success and stdout:
-                    specs['os_type'] = stdout.strip().lower()
-            
-            # Cek boot mode
-            logger.info(f"Checking boot mode for {ip}")
-            specs['boot_mode'] = await self.detect_boot_mode(ip)
-            
+                logger.info(f"Defaulting to legacy boot mode for {ip}")
+                specs['boot_mode'] = 'legacy'
+
             logger.info(f"System specs for {ip}: {specs}")
             return specs
-            
+
         except Exception as e:
             logger.error(f"Error checking specs for {ip}: {e}")
             return specs
+
+    async def _stream_sections(self, ip: str, script: str) -> Dict[str, str]:
+        """Jalankan script bermarker dan parse output per baris saat tiba
+
+        Pakai create_process + iterasi stdout supaya parsing overlap
+        dengan transfer, bukan buffer seluruh output dulu.
+        """
+        sections: Dict[str, str] = {}
+        current = None
+        buf = []
+
+        async with self.connections[ip].create_process(script) as proc:
+            async for line in proc.stdout:
+                stripped = line.strip()
+                if stripped.startswith('---') and stripped.endswith('---') and len(stripped) > 6:
+                    if current is not None:
+                        sections[current] = '\n'.join(buf).strip()
+                    current = stripped.strip('-')
+                    buf = []
+                elif current is not None:
+                    buf.append(stripped)
+
+        if current is not None:
+            sections[current] = '\n'.join(buf).strip()
+        return sections
     
     async def prepare_installation(self, ip: str) -> Tuple[bool, str]:
         """Persiapan VPS untuk instalasi Windows"""
@@ -217,39 +232,28 @@ class SSHManager:
             return False, "Not connected"
         
         try:
-            # Cleanup old installation
-            logger.info(f"Cleaning up old installation on {ip}")
-            await self.execute(ip, Settings.SSH_COMMANDS['CLEANUP_OLD'], timeout=30)
-            
-            # Create directory
-            logger.info(f"Creating installation directory on {ip}")
-            await self.execute(ip, Settings.SSH_COMMANDS['CREATE_DIR'], timeout=30)
-            
-            # Download installation script
-            logger.info(f"Downloading installation script to {ip}")
-            download_cmd = Settings.get_ssh_command('DOWNLOAD_SCRIPT')
-            success, stdout, stderr = await self.execute(
-                ip, 
-                download_cmd, 
-                timeout=120
-            )
+            # Cleanup + mkdir + download + verify dalam satu exec,
+            # bukan empat round-trip terpisah
+            logger.info(f"Preparing installation on {ip}")
+            prepare_script = '; '.join((
+                Settings.SSH_COMMANDS['CLEANUP_OLD'],
+                Settings.SSH_COMMANDS['CREATE_DIR'],
+                Settings.get_ssh_command('DOWNLOAD_SCRIPT'),
+                Settings.SSH_COMMANDS['VERIFY_SCRIPT'],
+            ))
+
+            success, stdout, stderr = await self.execute(ip, prepare_script, timeout=150)
             if not success:
-                logger.error(f"Download failed: {stderr}")
+                logger.error(f"Preparation failed: {stderr}")
                 return False, f"Failed to download script: {stderr}"
-            
-            # Verify script exists
-            success, stdout, stderr = await self.execute(
-                ip,
-                Settings.SSH_COMMANDS['VERIFY_SCRIPT'],
-                timeout=10
-            )
-            
-            if success and 'OK' in stdout:
+
+            if 'OK' in stdout:
                 logger.info(f"Installation prepared for {ip}")
                 return True, "Ready"
             else:
+                logger.error(f"Script verification failed on {ip}: {stderr[:200]}")
                 return False, "Script verification failed"
-                
+
         except Exception as e:
             error_msg = f"Preparation failed: {str(e)}"
             logger.error(f"Error preparing {ip}: {error_msg}")
@@ -328,4 +332,54 @@ class SSHManager:
         """Tutup semua koneksi"""
         ips = list(self.connections.keys())
         for ip in ips:
-            await self.disconnect(ip)
\ No newline at end of file
+            await self.disconnect(ip)
+
+
+class SSHConnectionPool:
+    """Pool koneksi SSH yang di-share antar instalasi
+
+    Koneksi di-cache per (ip, password) supaya instalasi ulang atau retry
+    ke VPS yang sama tidak bayar handshake SSH lagi. Keepalive mendeteksi
+    koneksi mati; acquire otomatis buat manager baru kalau koneksi lama
+    sudah tertutup.
+    """
+
+    def __init__(self, max_idle: int = 32):
+        self._idle: 'OrderedDict[Tuple[str, str], SSHManager]' = OrderedDict()
+        self._max_idle = max_idle
+
+    async def acquire(self, ip: str, password: str) -> SSHManager:
+        """Ambil SSHManager dari pool, atau buat baru jika tidak ada/mati"""
+        ssh = self._idle.pop((ip, password), None)
+        if ssh is not None:
+            if _connection_alive(ssh.connections.get(ip)):
+                return ssh
+            # Koneksi idle sudah mati, buang dan mulai bersih
+            await ssh.cleanup()
+        return SSHManager()
+
+    async def release(self, ip: str, password: str, ssh: SSHManager) -> None:
+        """Kembalikan SSHManager ke pool (koneksi hidup disimpan untuk reuse)"""
+        if not _connection_alive(ssh.connections.get(ip)):
+            await ssh.cleanup()
+            return
+
+        # Slot bisa sudah terisi manager lain (instalasi paralel ke host
+        # yang sama); tutup yang lama supaya koneksinya tidak bocor
+        displaced = self._idle.pop((ip, password), None)
+        if displaced is not None and displaced is not ssh:
+            await displaced.cleanup()
+
+        self._idle[(ip, password)] = ssh
+
+        # Evict koneksi idle paling lama jika pool penuh
+        while len(self._idle) > self._max_idle:
+            _, stale = self._idle.popitem(last=False)
+            await stale.cleanup()
+
+    async def close(self) -> None:
+        """Tutup semua koneksi idle di pool"""
+        managers = list(self._idle.values())
+        self._idle.clear()
+        for ssh in managers:
+            await ssh.cleanup()
\ No newline at end of file
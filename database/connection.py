@@ -13,6 +13,11 @@ from aiomysql import Pool, Connection
 import json
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from config.settings import Settings
 
 logger = logging.getLogger(__name__)
@@ -31,7 +36,7 @@ class ConnectionManager:
         self.config = Settings.DB_CONFIG
         
         self.pool_config = {
-            'minsize': 1,
+            'minsize': min(self.config['pool_min_size'], self.config['pool_size']),
             'maxsize': self.config['pool_size'],
             'pool_recycle': self.config['pool_recycle'],
         }
@@ -53,7 +58,10 @@ class ConnectionManager:
                 password=self.config['password'],
                 db=self.config['database'],
                 charset=self.config['charset'],
-                autocommit=False,
+                # Autocommit: hemat satu round-trip COMMIT per statement dan
+                # mencegah SELECT menahan snapshot transaksi sampai release.
+                # Multi-statement tetap lewat transaction() yang begin() eksplisit.
+                autocommit=True,
                 minsize=self.pool_config['minsize'],
                 maxsize=self.pool_config['maxsize'],
                 pool_recycle=self.pool_config['pool_recycle']
@@ -119,7 +127,6 @@ class ConnectionManager:
                 async with self.get_connection() as conn:
                     async with conn.cursor() as cursor:
                         await cursor.execute(query, params)
-                        await conn.commit()
                         return cursor.rowcount
             except Exception as e:
                 attempt += 1
@@ -166,6 +173,22 @@ class ConnectionManager:
                 logger.warning(f"Fetch attempt {attempt} failed: {e}, retrying in {self.retry_config['delay']}s")
                 await asyncio.sleep(self.retry_config['delay'])
     
+    async def fetch_iter(self, query: str, params: Tuple = None, batch_size: int = 256):
+        """Eksekusi query dan stream rows via server-side cursor
+
+        Rows diambil per batch dari server sehingga result set besar
+        tidak perlu dimuat penuh ke memory seperti fetch_all.
+        """
+        async with self.get_connection() as conn:
+            async with conn.cursor(aiomysql.SSDictCursor) as cursor:
+                await cursor.execute(query, params)
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row
+
     async def execute_transaction(self, operations: List[Tuple[str, Tuple]]) -> bool:
         """Eksekusi multiple operations dalam satu transaksi"""
         try:
@@ -192,6 +215,37 @@ class ConnectionManager:
             logger.error(f"Error checking table {table_name}: {e}")
             return False
     
+    async def check_index_exists(self, table_name: str, index_name: str) -> bool:
+        """Cek apakah index ada di table"""
+        try:
+            query = """
+                SELECT COUNT(*) as count
+                FROM information_schema.statistics
+                WHERE table_schema = %s AND table_name = %s AND index_name = %s
+            """
+            result = await self.fetch_one(
+                query, (self.config['database'], table_name, index_name)
+            )
+            return result['count'] > 0 if result else False
+        except Exception as e:
+            logger.error(f"Error checking index {index_name}: {e}")
+            return False
+
+    async def ensure_index(self, table_name: str, index_name: str, columns: str) -> bool:
+        """Buat index jika belum ada (idempotent, dipanggil saat startup)"""
+        try:
+            if await self.check_index_exists(table_name, index_name):
+                return True
+
+            await self.execute_query(
+                f"ALTER TABLE {table_name} ADD INDEX {index_name} ({columns})"
+            )
+            logger.info(f"Index {index_name} created on {table_name}({columns})")
+            return True
+        except Exception as e:
+            logger.error(f"Error creating index {index_name}: {e}")
+            return False
+
     async def get_database_info(self) -> Dict[str, Any]:
         """Dapatkan informasi database"""
         try:
@@ -261,18 +315,22 @@ class ConnectionManager:
         }
     
     def serialize_json_field(self, data: Any) -> str:
-        """Serialize data untuk JSON field"""
+        """Serialize data untuk JSON field (orjson jika tersedia)"""
         if data is None:
             return None
+        if orjson is not None:
+            return orjson.dumps(data).decode('utf-8')
         return json.dumps(data, ensure_ascii=False)
-    
+
     def deserialize_json_field(self, data: str) -> Any:
-        """Deserialize data dari JSON field"""
+        """Deserialize data dari JSON field (orjson jika tersedia)"""
         if data is None:
             return None
         try:
+            if orjson is not None:
+                return orjson.loads(data)
             return json.loads(data)
-        except (json.JSONDecodeError, TypeError):
+        except (ValueError, TypeError):
             return data
 
 
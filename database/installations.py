@@ -3,10 +3,12 @@ Database tracking untuk instalasi Windows
 Support untuk cross-platform notifications dan unified installation flow
 """
 
+import asyncio
 import logging
+import time
 import uuid
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Any
+from typing import Optional, Tuple, Dict, List, Any, AsyncIterator
 from database.connection import db_manager
 from config.settings import Settings
 
@@ -15,14 +17,122 @@ logger = logging.getLogger(__name__)
 
 class InstallationDatabase:
     """Database untuk tracking instalasi"""
-    
+
+    # SQL constants - dibangun sekali di class body, bukan f-string per call
+    _SQL_CREATE = """
+        INSERT INTO installations
+        (install_id, user_id, status, start_time, ip, os_code, os_name,
+         boot_mode, current_step, last_update)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    _SQL_UPDATE_STEP = """
+        UPDATE installations
+        SET current_step = %s, last_update = %s
+        WHERE install_id = %s
+    """
+    _SQL_ADD_LOG = """
+        INSERT INTO installation_logs (install_id, timestamp, message)
+        VALUES (%s, %s, %s)
+    """
+    _SQL_GET_LOGS = """
+        SELECT timestamp, message FROM (
+            SELECT timestamp, message
+            FROM installation_logs
+            WHERE install_id = %s
+            ORDER BY timestamp DESC
+            LIMIT %s
+        ) t ORDER BY timestamp ASC
+    """
+    _SQL_GET = """
+        SELECT install_id, user_id, status, start_time, end_time, ip,
+               os_code, os_name, boot_mode, current_step, error, rdp_info, last_update
+        FROM installations
+        WHERE install_id = %s
+    """
+    _SQL_DELETE = "DELETE FROM installations WHERE install_id = %s"
+    _SQL_HAS_ACTIVE = """
+        SELECT 1
+        FROM installations
+        WHERE user_id = %s AND ip = %s
+        AND status NOT IN (%s, %s, %s)
+        LIMIT 1
+    """
+    _SQL_CLEANUP_OLD = """
+        DELETE FROM installations
+        WHERE start_time < %s
+        AND status IN (%s, %s, %s)
+        LIMIT %s
+    """
+    _SQL_CLEANUP_OLD_LOGS = "DELETE FROM installation_logs WHERE timestamp < %s LIMIT %s"
+
     def __init__(self):
         self.table_name = 'installations'
         self.logs_table = 'installation_logs'
+        # Progress subscribers per install_id (push, bukan polling get())
+        self._progress_listeners: Dict[str, List[asyncio.Queue]] = {}
+        # Cache hasil get_stats: (payload, cached_at), TTL pendek
+        self._stats_cache: Optional[Tuple[Dict, float]] = None
+
+    def subscribe_progress(self, install_id: str) -> asyncio.Queue:
+        """Subscribe ke progress update untuk satu instalasi
+
+        Subscriber menerima dict {'install_id', 'status', 'step'} lewat
+        queue setiap kali status/step berubah, tanpa perlu re-poll get().
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._progress_listeners.setdefault(install_id, []).append(queue)
+        return queue
+
+    def unsubscribe_progress(self, install_id: str, queue: asyncio.Queue) -> None:
+        """Lepas subscription progress untuk satu instalasi"""
+        listeners = self._progress_listeners.get(install_id)
+        if listeners and queue in listeners:
+            listeners.remove(queue)
+            if not listeners:
+                del self._progress_listeners[install_id]
+
+    def _notify_progress(self, install_id: str, status: str, step: str = None) -> None:
+        """Push progress event ke semua subscriber instalasi ini"""
+        listeners = self._progress_listeners.get(install_id)
+        if not listeners:
+            return
+
+        event = {'install_id': install_id, 'status': status, 'step': step}
+        for queue in listeners:
+            queue.put_nowait(event)
+
+    @staticmethod
+    def _force_rdp_port(rdp_info: Optional[Dict]) -> Optional[Dict]:
+        """Terapkan invariant port RDP selalu 22 di satu tempat"""
+        if rdp_info:
+            rdp_info['port'] = Settings.RDP_PORT
+        return rdp_info
+
+    def _format_installation(self, install: Dict) -> Dict:
+        """Format row instalasi: isoformat datetime dan deserialize JSON fields"""
+        formatted_install = dict(install)
+
+        # Format datetime fields
+        for field in ('start_time', 'end_time', 'last_update'):
+            if formatted_install.get(field):
+                formatted_install[field] = formatted_install[field].isoformat()
+
+        # Deserialize JSON fields
+        if formatted_install.get('rdp_info'):
+            formatted_install['rdp_info'] = self._force_rdp_port(
+                db_manager.deserialize_json_field(formatted_install['rdp_info'])
+            )
+
+        return formatted_install
     
     async def initialize(self):
         """Inisialisasi database"""
         try:
+            # Index untuk probe has_active_install (user_id, ip, status)
+            await db_manager.ensure_index(
+                self.table_name, 'idx_installs_user_ip_status', 'user_id, ip, status'
+            )
+
             # Cleanup instalasi yang stuck atau lama
             await self.cleanup_stuck_installations()
             await self.cleanup_old_installations(days=Settings.CLEANUP_OLD_INSTALLS_DAYS)
@@ -39,16 +149,9 @@ class InstallationDatabase:
         try:
             install_id = f"install_{user_id}_{uuid.uuid4().hex[:8]}"
             
-            insert_query = f"""
-                INSERT INTO {self.table_name} 
-                (install_id, user_id, status, start_time, ip, os_code, os_name, 
-                 boot_mode, current_step, last_update)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
             now = datetime.now()
-            
-            await db_manager.execute_query(insert_query, (
+
+            await db_manager.execute_query(self._SQL_CREATE, (
                 install_id,
                 user_id,
                 Settings.INSTALL_STATUS_STARTING,
@@ -71,6 +174,22 @@ class InstallationDatabase:
             logger.error(f"Error creating installation: {e}")
             return ""
     
+    async def has_active_install(self, user_id: int, ip: str) -> bool:
+        """Cek apakah user masih punya instalasi aktif ke IP ini"""
+        try:
+            row = await db_manager.fetch_one(self._SQL_HAS_ACTIVE, (
+                user_id,
+                ip,
+                Settings.INSTALL_STATUS_COMPLETED,
+                Settings.INSTALL_STATUS_FAILED,
+                Settings.INSTALL_STATUS_TIMEOUT
+            ))
+            return row is not None
+
+        except Exception as e:
+            logger.error(f"Error checking active install for user {user_id}: {e}")
+            return False
+
     async def update_status(self, install_id: str, status: str, extra_data: Dict = None) -> bool:
         """Update status instalasi"""
         try:
@@ -88,9 +207,7 @@ class InstallationDatabase:
                 
                 if extra_data and 'rdp_info' in extra_data:
                     update_fields.append('rdp_info = %s')
-                    # Ensure port is always 22
-                    rdp_info = extra_data['rdp_info']
-                    rdp_info['port'] = Settings.RDP_PORT
+                    rdp_info = self._force_rdp_port(extra_data['rdp_info'])
                     params.append(db_manager.serialize_json_field(rdp_info))
                 
                 if extra_data and 'boot_mode' in extra_data:
@@ -122,8 +239,9 @@ class InstallationDatabase:
             result = await db_manager.execute_query(query, tuple(params))
             
             if result > 0:
-                # Log perubahan status
+                # Log perubahan status dan push ke subscriber
                 await self.add_log(install_id, f"Status changed to: {status}")
+                self._notify_progress(install_id, status)
                 return True
             
             return False
@@ -135,21 +253,16 @@ class InstallationDatabase:
     async def update_step(self, install_id: str, step: str) -> bool:
         """Update langkah instalasi saat ini"""
         try:
-            query = f"""
-                UPDATE {self.table_name} 
-                SET current_step = %s, last_update = %s 
-                WHERE install_id = %s
-            """
-            
-            result = await db_manager.execute_query(query, (
+            result = await db_manager.execute_query(self._SQL_UPDATE_STEP, (
                 step,
                 datetime.now(),
                 install_id
             ))
             
             if result > 0:
-                # Tambah ke log
+                # Tambah ke log dan push ke subscriber
                 await self.add_log(install_id, step)
+                self._notify_progress(install_id, None, step)
                 return True
             
             return False
@@ -161,12 +274,7 @@ class InstallationDatabase:
     async def add_log(self, install_id: str, message: str) -> bool:
         """Tambah log entry untuk instalasi"""
         try:
-            query = f"""
-                INSERT INTO {self.logs_table} (install_id, timestamp, message)
-                VALUES (%s, %s, %s)
-            """
-            
-            await db_manager.execute_query(query, (
+            await db_manager.execute_query(self._SQL_ADD_LOG, (
                 install_id,
                 datetime.now(),
                 message
@@ -181,128 +289,88 @@ class InstallationDatabase:
     async def get_logs(self, install_id: str, limit: int = 50) -> List[Dict]:
         """Dapatkan logs untuk instalasi"""
         try:
-            query = f"""
-                SELECT timestamp, message 
-                FROM {self.logs_table} 
-                WHERE install_id = %s 
-                ORDER BY timestamp DESC 
-                LIMIT %s
-            """
-            
-            logs = await db_manager.fetch_all(query, (install_id, limit))
+            logs = await db_manager.fetch_all(self._SQL_GET_LOGS, (install_id, limit))
             
-            # Format logs
+            # Format logs - sudah chronological dari subquery
             formatted_logs = []
             for log in logs:
                 formatted_logs.append({
                     'time': log['timestamp'].isoformat(),
                     'message': log['message']
                 })
-            
-            return list(reversed(formatted_logs))  # Reverse untuk urutan chronological
+
+            return formatted_logs
             
         except Exception as e:
             logger.error(f"Error getting logs: {e}")
             return []
     
+    async def iter_user_installations(self, user_id: int, status: str = None) -> AsyncIterator[Dict]:
+        """Stream semua instalasi untuk user via server-side cursor"""
+        base_query = f"""
+            SELECT install_id, user_id, status, start_time, end_time, ip,
+                   os_code, os_name, boot_mode, current_step, error, rdp_info, last_update
+            FROM {self.table_name}
+            WHERE user_id = %s
+        """
+
+        params = [user_id]
+
+        if status:
+            base_query += " AND status = %s"
+            params.append(status)
+
+        base_query += " ORDER BY start_time DESC"
+
+        async for install in db_manager.fetch_iter(base_query, tuple(params)):
+            yield self._format_installation(install)
+
     async def get_user_installations(self, user_id: int, status: str = None) -> List[Dict]:
         """Dapatkan semua instalasi untuk user"""
         try:
-            base_query = f"""
-                SELECT install_id, user_id, status, start_time, end_time, ip, 
-                       os_code, os_name, boot_mode, current_step, error, rdp_info, last_update
-                FROM {self.table_name} 
-                WHERE user_id = %s
-            """
-            
-            params = [user_id]
-            
-            if status:
-                base_query += " AND status = %s"
-                params.append(status)
-            
-            base_query += " ORDER BY start_time DESC"
-            
-            installations = await db_manager.fetch_all(base_query, tuple(params))
-            
-            # Format installations
-            formatted_installations = []
-            for install in installations:
-                formatted_install = dict(install)
-                
-                # Format datetime fields
-                if formatted_install['start_time']:
-                    formatted_install['start_time'] = formatted_install['start_time'].isoformat()
-                
-                if formatted_install['end_time']:
-                    formatted_install['end_time'] = formatted_install['end_time'].isoformat()
-                
-                if formatted_install['last_update']:
-                    formatted_install['last_update'] = formatted_install['last_update'].isoformat()
-                
-                # Deserialize JSON fields
-                if formatted_install['rdp_info']:
-                    formatted_install['rdp_info'] = db_manager.deserialize_json_field(formatted_install['rdp_info'])
-                    # Ensure port is always 22
-                    if formatted_install['rdp_info']:
-                        formatted_install['rdp_info']['port'] = Settings.RDP_PORT
-                
-                formatted_installations.append(formatted_install)
-            
-            return formatted_installations
-            
+            return [install async for install in self.iter_user_installations(user_id, status)]
+
         except Exception as e:
             logger.error(f"Error getting user installations: {e}")
             return []
     
+    async def iter_active_installations(self, user_id: int = None) -> AsyncIterator[Dict]:
+        """Stream semua instalasi yang masih aktif via server-side cursor"""
+        active_statuses = [
+            Settings.INSTALL_STATUS_STARTING,
+            Settings.INSTALL_STATUS_CONNECTING,
+            Settings.INSTALL_STATUS_CHECKING,
+            Settings.INSTALL_STATUS_PREPARING,
+            Settings.INSTALL_STATUS_INSTALLING,
+            Settings.INSTALL_STATUS_MONITORING
+        ]
+
+        # Build query dengan IN clause
+        status_placeholders = ', '.join(['%s'] * len(active_statuses))
+
+        base_query = f"""
+            SELECT install_id, user_id, status, start_time, ip, os_code, os_name,
+                   boot_mode, current_step, last_update
+            FROM {self.table_name}
+            WHERE status IN ({status_placeholders})
+        """
+
+        params = active_statuses
+
+        if user_id is not None:
+            base_query += " AND user_id = %s"
+            params.append(user_id)
+
+        base_query += " ORDER BY start_time DESC"
+
+        async for install in db_manager.fetch_iter(base_query, tuple(params)):
+            yield self._format_installation(install)
+
     async def get_active_installations(self, user_id: int = None) -> List[Dict]:
         """Dapatkan semua instalasi yang masih aktif"""
         try:
-            active_statuses = [
-                Settings.INSTALL_STATUS_STARTING,
-                Settings.INSTALL_STATUS_CONNECTING,
-                Settings.INSTALL_STATUS_CHECKING,
-                Settings.INSTALL_STATUS_PREPARING,
-                Settings.INSTALL_STATUS_INSTALLING,
-                Settings.INSTALL_STATUS_MONITORING
-            ]
-            
-            # Build query dengan IN clause
-            status_placeholders = ', '.join(['%s'] * len(active_statuses))
-            
-            base_query = f"""
-                SELECT install_id, user_id, status, start_time, ip, os_code, os_name, 
-                       boot_mode, current_step, last_update
-                FROM {self.table_name} 
-                WHERE status IN ({status_placeholders})
-            """
-            
-            params = active_statuses
-            
-            if user_id is not None:
-                base_query += " AND user_id = %s"
-                params.append(user_id)
-            
-            base_query += " ORDER BY start_time DESC"
-            
-            installations = await db_manager.fetch_all(base_query, tuple(params))
-            
-            # Format installations
-            formatted_installations = []
-            for install in installations:
-                formatted_install = dict(install)
-                
-                # Format datetime fields
-                if formatted_install['start_time']:
-                    formatted_install['start_time'] = formatted_install['start_time'].isoformat()
-                
-                if formatted_install['last_update']:
-                    formatted_install['last_update'] = formatted_install['last_update'].isoformat()
-                
-                formatted_installations.append(formatted_install)
-            
-            return formatted_installations
-            
+            return [install async for install in self.iter_active_installations(user_id)]
+
         except Exception as e:
             logger.error(f"Error getting active installations: {e}")
             return []
@@ -310,35 +378,13 @@ class InstallationDatabase:
     async def get(self, install_id: str) -> Optional[Dict]:
         """Dapatkan instalasi berdasarkan ID"""
         try:
-            installation = await db_manager.fetch_one(f"""
-                SELECT install_id, user_id, status, start_time, end_time, ip, 
-                       os_code, os_name, boot_mode, current_step, error, rdp_info, last_update
-                FROM {self.table_name} 
-                WHERE install_id = %s
-            """, (install_id,))
+            installation = await db_manager.fetch_one(self._SQL_GET, (install_id,))
             
             if not installation:
                 return None
-            
-            formatted_installation = dict(installation)
-            
-            # Format datetime fields
-            if formatted_installation['start_time']:
-                formatted_installation['start_time'] = formatted_installation['start_time'].isoformat()
-            
-            if formatted_installation['end_time']:
-                formatted_installation['end_time'] = formatted_installation['end_time'].isoformat()
-            
-            if formatted_installation['last_update']:
-                formatted_installation['last_update'] = formatted_installation['last_update'].isoformat()
-            
-            # Deserialize JSON fields
-            if formatted_installation['rdp_info']:
-                formatted_installation['rdp_info'] = db_manager.deserialize_json_field(formatted_installation['rdp_info'])
-                # Ensure port is always 22
-                if formatted_installation['rdp_info']:
-                    formatted_installation['rdp_info']['port'] = Settings.RDP_PORT
-            
+
+            formatted_installation = self._format_installation(installation)
+
             # Add logs
             formatted_installation['logs'] = await self.get_logs(install_id, 50)
             
@@ -353,25 +399,27 @@ class InstallationDatabase:
         try:
             days = days or Settings.CLEANUP_OLD_INSTALLS_DAYS
             cutoff_date = datetime.now() - timedelta(days=days)
-            
-            # Hapus instalasi lama yang sudah completed/failed/timeout
-            query = f"""
-                DELETE FROM {self.table_name} 
-                WHERE start_time < %s 
-                AND status IN (%s, %s, %s)
-            """
-            
-            result = await db_manager.execute_query(query, (
-                cutoff_date,
-                Settings.INSTALL_STATUS_COMPLETED,
-                Settings.INSTALL_STATUS_FAILED,
-                Settings.INSTALL_STATUS_TIMEOUT
-            ))
-            
-            if result > 0:
-                logger.info(f"Cleaned up {result} old installations (>{days} days)")
-            
-            return result
+            batch_size = 10000
+
+            # Hapus instalasi lama yang sudah completed/failed/timeout,
+            # per batch supaya range DELETE tidak menahan lock lama
+            total_deleted = 0
+            while True:
+                deleted = await db_manager.execute_query(self._SQL_CLEANUP_OLD, (
+                    cutoff_date,
+                    Settings.INSTALL_STATUS_COMPLETED,
+                    Settings.INSTALL_STATUS_FAILED,
+                    Settings.INSTALL_STATUS_TIMEOUT,
+                    batch_size
+                ))
+                total_deleted += deleted
+                if deleted < batch_size:
+                    break
+
+            if total_deleted > 0:
+                logger.info(f"Cleaned up {total_deleted} old installations (>{days} days)")
+
+            return total_deleted
             
         except Exception as e:
             logger.error(f"Error cleaning up old installations: {e}")
@@ -381,7 +429,8 @@ class InstallationDatabase:
         """Cleanup instalasi yang stuck/timeout"""
         try:
             timeout_seconds = Settings.TIMEOUT_INSTALLATION
-            cutoff_time = datetime.now() - timedelta(seconds=timeout_seconds)
+            now = datetime.now()
+            cutoff_time = now - timedelta(seconds=timeout_seconds)
             
             active_statuses = [
                 Settings.INSTALL_STATUS_STARTING,
@@ -409,9 +458,9 @@ class InstallationDatabase:
             params = [
                 Settings.INSTALL_STATUS_TIMEOUT,
                 'Installation timeout (30 minutes)',
-                datetime.now(),
+                now,
                 'Installation timeout',
-                datetime.now(),
+                now,
                 cutoff_time
             ] + active_statuses
             
@@ -429,14 +478,27 @@ class InstallationDatabase:
     async def get_stats(self) -> Dict[str, Any]:
         """Dapatkan statistik instalasi"""
         try:
-            # Basic stats
+            # Statistik berubah lambat, cukup refresh per TTL; adminpanel
+            # dan dbstats share hasil yang sama
+            if self._stats_cache is not None:
+                stats, cached_at = self._stats_cache
+                if time.monotonic() - cached_at < Settings.STATS_CACHE_TTL_SECONDS:
+                    return stats
+
+            # Basic stats - satu query aggregate, success rate dan recent
+            # count dihitung langsung di SQL
             basic_stats = await db_manager.fetch_one(f"""
-                SELECT 
+                SELECT
                     COUNT(*) as total,
                     SUM(CASE WHEN status IN (%s, %s, %s, %s, %s, %s) THEN 1 ELSE 0 END) as active,
                     SUM(CASE WHEN status = %s THEN 1 ELSE 0 END) as completed,
                     SUM(CASE WHEN status = %s THEN 1 ELSE 0 END) as failed,
-                    SUM(CASE WHEN status = %s THEN 1 ELSE 0 END) as timeout
+                    SUM(CASE WHEN status = %s THEN 1 ELSE 0 END) as timeout,
+                    SUM(CASE WHEN start_time >= %s THEN 1 ELSE 0 END) as recent_24h,
+                    ROUND(COALESCE(
+                        100.0 * SUM(CASE WHEN status = %s THEN 1 ELSE 0 END) / NULLIF(COUNT(*), 0),
+                        0
+                    ), 2) as success_rate
                 FROM {self.table_name}
             """, (
                 Settings.INSTALL_STATUS_STARTING,
@@ -447,39 +509,34 @@ class InstallationDatabase:
                 Settings.INSTALL_STATUS_MONITORING,
                 Settings.INSTALL_STATUS_COMPLETED,
                 Settings.INSTALL_STATUS_FAILED,
-                Settings.INSTALL_STATUS_TIMEOUT
+                Settings.INSTALL_STATUS_TIMEOUT,
+                datetime.now() - timedelta(hours=24),
+                Settings.INSTALL_STATUS_COMPLETED
             ))
-            
+
             # Stats per OS
             os_stats = await db_manager.fetch_all(f"""
-                SELECT os_code, COUNT(*) as count 
-                FROM {self.table_name} 
-                GROUP BY os_code 
+                SELECT os_code, COUNT(*) as count
+                FROM {self.table_name}
+                GROUP BY os_code
                 ORDER BY count DESC
             """)
-            
-            # Recent installations (24 jam terakhir)
-            recent_count = await db_manager.fetch_one(f"""
-                SELECT COUNT(*) as count 
-                FROM {self.table_name} 
-                WHERE start_time >= %s
-            """, (datetime.now() - timedelta(hours=24),))
-            
-            # Success rate
-            total = basic_stats['total'] if basic_stats else 0
-            completed = basic_stats['completed'] if basic_stats else 0
-            success_rate = (completed / total * 100) if total > 0 else 0
-            
-            return {
-                'total': total,
-                'active': basic_stats['active'] if basic_stats else 0,
-                'completed': completed,
-                'failed': basic_stats['failed'] if basic_stats else 0,
-                'timeout': basic_stats['timeout'] if basic_stats else 0,
-                'success_rate': round(success_rate, 2),
-                'recent_24h': recent_count['count'] if recent_count else 0,
+
+            if not basic_stats:
+                basic_stats = {}
+
+            result = {
+                'total': basic_stats.get('total', 0),
+                'active': basic_stats.get('active') or 0,
+                'completed': basic_stats.get('completed') or 0,
+                'failed': basic_stats.get('failed') or 0,
+                'timeout': basic_stats.get('timeout') or 0,
+                'success_rate': float(basic_stats.get('success_rate') or 0),
+                'recent_24h': basic_stats.get('recent_24h') or 0,
                 'os_stats': {item['os_code']: item['count'] for item in os_stats}
             }
+            self._stats_cache = (result, time.monotonic())
+            return result
             
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
@@ -494,76 +551,50 @@ class InstallationDatabase:
                 'os_stats': {}
             }
     
+    async def iter_installations_by_status(self, status: str, limit: int = 100) -> AsyncIterator[Dict]:
+        """Stream instalasi berdasarkan status via server-side cursor"""
+        query = f"""
+            SELECT install_id, user_id, status, start_time, end_time, ip,
+                   os_code, os_name, boot_mode, current_step, last_update
+            FROM {self.table_name}
+            WHERE status = %s
+            ORDER BY start_time DESC
+            LIMIT %s
+        """
+
+        async for install in db_manager.fetch_iter(query, (status, limit)):
+            yield self._format_installation(install)
+
     async def get_installations_by_status(self, status: str, limit: int = 100) -> List[Dict]:
         """Dapatkan instalasi berdasarkan status"""
         try:
-            query = f"""
-                SELECT install_id, user_id, status, start_time, end_time, ip, 
-                       os_code, os_name, boot_mode, current_step, last_update
-                FROM {self.table_name} 
-                WHERE status = %s 
-                ORDER BY start_time DESC 
-                LIMIT %s
-            """
-            
-            installations = await db_manager.fetch_all(query, (status, limit))
-            
-            formatted_installations = []
-            for install in installations:
-                formatted_install = dict(install)
-                
-                # Format datetime fields
-                if formatted_install['start_time']:
-                    formatted_install['start_time'] = formatted_install['start_time'].isoformat()
-                
-                if formatted_install['end_time']:
-                    formatted_install['end_time'] = formatted_install['end_time'].isoformat()
-                
-                if formatted_install['last_update']:
-                    formatted_install['last_update'] = formatted_install['last_update'].isoformat()
-                
-                formatted_installations.append(formatted_install)
-            
-            return formatted_installations
-            
+            return [install async for install in self.iter_installations_by_status(status, limit)]
+
         except Exception as e:
             logger.error(f"Error getting installations by status: {e}")
             return []
-    
+
+    async def iter_recent_installations(self, hours: int = 24, limit: int = 100) -> AsyncIterator[Dict]:
+        """Stream instalasi terbaru dalam X jam terakhir via server-side cursor"""
+        cutoff_time = datetime.now() - timedelta(hours=hours)
+
+        query = f"""
+            SELECT install_id, user_id, status, start_time, end_time, ip,
+                   os_code, os_name, boot_mode, current_step, last_update
+            FROM {self.table_name}
+            WHERE start_time >= %s
+            ORDER BY start_time DESC
+            LIMIT %s
+        """
+
+        async for install in db_manager.fetch_iter(query, (cutoff_time, limit)):
+            yield self._format_installation(install)
+
     async def get_recent_installations(self, hours: int = 24, limit: int = 100) -> List[Dict]:
         """Dapatkan instalasi terbaru dalam X jam terakhir"""
         try:
-            cutoff_time = datetime.now() - timedelta(hours=hours)
-            
-            query = f"""
-                SELECT install_id, user_id, status, start_time, end_time, ip, 
-                       os_code, os_name, boot_mode, current_step, last_update
-                FROM {self.table_name} 
-                WHERE start_time >= %s 
-                ORDER BY start_time DESC 
-                LIMIT %s
-            """
-            
-            installations = await db_manager.fetch_all(query, (cutoff_time, limit))
-            
-            formatted_installations = []
-            for install in installations:
-                formatted_install = dict(install)
-                
-                # Format datetime fields
-                if formatted_install['start_time']:
-                    formatted_install['start_time'] = formatted_install['start_time'].isoformat()
-                
-                if formatted_install['end_time']:
-                    formatted_install['end_time'] = formatted_install['end_time'].isoformat()
-                
-                if formatted_install['last_update']:
-                    formatted_install['last_update'] = formatted_install['last_update'].isoformat()
-                
-                formatted_installations.append(formatted_install)
-            
-            return formatted_installations
-            
+            return [install async for install in self.iter_recent_installations(hours, limit)]
+
         except Exception as e:
             logger.error(f"Error getting recent installations: {e}")
             return []
@@ -572,10 +603,7 @@ class InstallationDatabase:
         """Hapus instalasi dan semua logs terkait"""
         try:
             # CASCADE akan otomatis hapus logs
-            result = await db_manager.execute_query(
-                f"DELETE FROM {self.table_name} WHERE install_id = %s",
-                (install_id,)
-            )
+            result = await db_manager.execute_query(self._SQL_DELETE, (install_id,))
             
             return result > 0
             
@@ -588,16 +616,23 @@ class InstallationDatabase:
         try:
             days = days or Settings.CLEANUP_OLD_LOGS_DAYS
             cutoff_date = datetime.now() - timedelta(days=days)
-            
-            result = await db_manager.execute_query(
-                f"DELETE FROM {self.logs_table} WHERE timestamp < %s",
-                (cutoff_date,)
-            )
-            
-            if result > 0:
-                logger.info(f"Cleaned up {result} old logs (>{days} days)")
-            
-            return result
+            batch_size = 10000
+
+            # Hapus per batch supaya tidak menahan lock lama di table logs
+            total_deleted = 0
+            while True:
+                deleted = await db_manager.execute_query(
+                    self._SQL_CLEANUP_OLD_LOGS,
+                    (cutoff_date, batch_size)
+                )
+                total_deleted += deleted
+                if deleted < batch_size:
+                    break
+
+            if total_deleted > 0:
+                logger.info(f"Cleaned up {total_deleted} old logs (>{days} days)")
+
+            return total_deleted
             
         except Exception as e:
             logger.error(f"Error cleaning up old logs: {e}")
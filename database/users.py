@@ -4,7 +4,13 @@ Simplified dengan single update stats method
 Support untuk cross-platform notifications
 """
 
+import asyncio
+import hmac
 import logging
+import re
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
 from datetime import datetime, timedelta
 from typing import Optional, Tuple, Dict, List
 from database.connection import db_manager
@@ -12,48 +18,285 @@ from config.settings import Settings
 
 logger = logging.getLogger(__name__)
 
+# Memo per-request: handler yang sama sering lookup user yang sama
+# beberapa kali (check_session, is_admin, get_user_by_telegram_id)
+_request_cache: ContextVar = ContextVar('user_request_cache', default=None)
+
+# Satu match C-level untuk panjang + alphanumeric, plus batas atas 64 char
+_USERNAME_RE = re.compile(r'^[A-Za-z0-9]{%d,64}$' % Settings.MIN_USERNAME_LENGTH)
+
+
+def begin_request_cache():
+    """Mulai scope memoization untuk satu request/update
+
+    Dipanggil di awal setiap handler; lookup user berikutnya dalam
+    task yang sama dibaca dari memo alih-alih query ulang.
+    """
+    _request_cache.set({})
+
 
 class UserDatabase:
     """Database untuk mengelola users"""
-    
+
+    # SQL constants - dibangun sekali di class body, bukan f-string per call
+    _SQL_GET_ID_BY_USERNAME = "SELECT id FROM users WHERE username = %s"
+    _SQL_GET_ID_BY_TG = "SELECT id FROM users WHERE telegram_id = %s"
+    # Satu probe untuk dua kemungkinan konflik sekaligus
+    _SQL_CHECK_CONFLICT = """
+        SELECT COALESCE(SUM(username = %s), 0) AS name_taken,
+               COALESCE(SUM(telegram_id = %s), 0) AS tg_taken
+        FROM users
+        WHERE username = %s OR telegram_id = %s
+    """
+    _SQL_INSERT_ADMIN = """
+        INSERT INTO users
+        (username, password, is_admin, status, created_at,
+         total_installs, success_installs, failed_installs)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    _SQL_INSERT_USER = """
+        INSERT INTO users
+        (username, password, telegram_id, is_admin, status, created_at,
+         total_installs, success_installs, failed_installs)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    _SQL_GET_LOGIN = """
+        SELECT id, password, status, is_admin, telegram_id
+        FROM users WHERE username = %s
+    """
+    _SQL_UPDATE_LOGIN_TG = "UPDATE users SET telegram_id = %s, last_login = %s WHERE id = %s"
+    _SQL_UPDATE_LOGIN = "UPDATE users SET last_login = %s WHERE id = %s"
+    # Tanpa ORDER BY: login/_create_user_session menjamin maksimal satu
+    # session aktif per telegram_id (deactivate + insert satu transaksi)
+    _SQL_CHECK_SESSION = """
+        SELECT s.user_id, s.expires_at, u.status, u.username
+        FROM user_sessions s
+        JOIN users u ON s.user_id = u.id
+        WHERE s.telegram_id = %s AND s.is_active = %s AND s.expires_at > %s
+        LIMIT 1
+    """
+    _SQL_USER_FIELDS = """
+        SELECT id, username, password, telegram_id, is_admin, status,
+               created_at, last_login, total_installs, success_installs, failed_installs
+        FROM users
+    """
+    _SQL_GET_BY_ID = _SQL_USER_FIELDS + " WHERE id = %s"
+    _SQL_GET_BY_TG = _SQL_USER_FIELDS + " WHERE telegram_id = %s"
+    _SQL_GET_BY_USERNAME = _SQL_USER_FIELDS + " WHERE username = %s"
+    _SQL_IS_ADMIN = "SELECT is_admin FROM users WHERE telegram_id = %s AND status = %s"
+    _SQL_LOGOUT = "UPDATE user_sessions SET is_active = %s WHERE telegram_id = %s"
+    _SQL_DELETE_USER = "DELETE FROM users WHERE id = %s"
+    _SQL_BAN_USER = """
+        UPDATE users u
+        LEFT JOIN user_sessions s ON s.user_id = u.id
+        SET u.status = %s, s.is_active = %s
+        WHERE u.username = %s
+    """
+    _SQL_UNBAN_USER = "UPDATE users SET status = %s WHERE username = %s AND status = %s"
+    _SQL_GET_TG_IDS = """
+        SELECT telegram_id
+        FROM users
+        WHERE telegram_id IS NOT NULL AND status = %s
+    """
+    # Tanggal diformat di SQL, bukan per-row di Python
+    _SQL_USER_LIST = """
+        SELECT username, is_admin, status, total_installs, success_installs,
+               failed_installs,
+               DATE_FORMAT(created_at, '%Y-%m-%d') as created_at,
+               DATE_FORMAT(last_login, '%m-%d %H:%i') as last_login,
+               telegram_id
+        FROM users
+        ORDER BY created_at DESC
+    """
+    _SQL_USER_STATS = """
+        SELECT
+            COUNT(*) as total_users,
+            SUM(CASE WHEN status = %s THEN 1 ELSE 0 END) as active_users,
+            SUM(CASE WHEN status = %s THEN 1 ELSE 0 END) as banned_users,
+            SUM(CASE WHEN is_admin = 1 THEN 1 ELSE 0 END) as admin_users,
+            SUM(CASE WHEN telegram_id IS NOT NULL THEN 1 ELSE 0 END) as users_with_telegram,
+            SUM(CASE WHEN telegram_id IS NULL THEN 1 ELSE 0 END) as api_only_users,
+            SUM(total_installs) as total_installations,
+            SUM(success_installs) as successful_installations,
+            SUM(failed_installs) as failed_installations
+        FROM users
+    """
+    _SQL_DEACTIVATE_SESSIONS = "UPDATE user_sessions SET is_active = %s WHERE user_id = %s"
+    _SQL_INSERT_SESSION = """
+        INSERT INTO user_sessions
+        (user_id, telegram_id, login_time, last_activity, expires_at, is_active)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    _SQL_PURGE_SESSIONS = """
+        DELETE FROM user_sessions
+        WHERE (is_active = %s AND last_activity < %s)
+        OR expires_at < %s
+    """
+    _SQL_COUNT_SESSIONS_USER = """
+        SELECT COUNT(*) as count
+        FROM user_sessions
+        WHERE user_id = %s AND is_active = %s AND expires_at > %s
+    """
+    _SQL_COUNT_SESSIONS_ALL = """
+        SELECT COUNT(*) as count
+        FROM user_sessions
+        WHERE is_active = %s AND expires_at > %s
+    """
+    _SQL_FLUSH_STATS = """
+        UPDATE users
+        SET total_installs = total_installs + %s,
+            success_installs = success_installs + %s,
+            failed_installs = failed_installs + %s
+        WHERE id = %s
+    """
+
     def __init__(self):
         self.table_name = 'users'
         self.sessions_table = 'user_sessions'
-    
+        # Session cache: telegram_id -> (status, expires_at, cached_at)
+        # Hot path check_session tidak perlu query DB selama TTL
+        self._session_cache: OrderedDict = OrderedDict()
+        # Admin cache lintas-request: telegram_id -> (is_admin, cached_at)
+        self._admin_cache: OrderedDict = OrderedDict()
+        # Pending last_activity updates, di-flush batch oleh background task
+        self._pending_activity: set = set()
+        self._activity_flush_task: Optional[asyncio.Task] = None
+        # Buffer install stats: user_id -> [success_delta, fail_delta]
+        self._stats_buf: Dict[int, List[int]] = {}
+        self._stats_flush_task: Optional[asyncio.Task] = None
+        # Cache telegram IDs aktif untuk broadcast, invalidated saat user
+        # berubah; tuple immutable jadi aman di-share antar caller
+        self._tg_ids_cache: Optional[Tuple[int, ...]] = None
+        self._session_cleanup_task: Optional[asyncio.Task] = None
+        # Cache hasil get_user_stats: (payload, cached_at), TTL pendek
+        self._user_stats_cache: Optional[Tuple[Dict, float]] = None
+        # Gauge jumlah session aktif, invalidated saat session berubah
+        self._session_gauge: Optional[int] = None
+
     async def initialize(self):
         """Inisialisasi database dan buat admin default jika belum ada"""
         try:
             # Buat admin default jika belum ada
             await self._ensure_admin_exists()
-            
+
+            # Pastikan index untuk hot path auth ada
+            await self._ensure_indexes()
+
             # Cleanup expired sessions
             await self._cleanup_expired_sessions()
-            
+
+            # Start background flush untuk last_activity updates
+            if self._activity_flush_task is None:
+                self._activity_flush_task = asyncio.create_task(self._activity_flush_loop())
+
+            # Start background flush untuk install stats
+            if self._stats_flush_task is None:
+                self._stats_flush_task = asyncio.create_task(self._stats_flush_loop())
+
+            # Cleanup session expired berjalan periodik, bukan di hot path
+            if self._session_cleanup_task is None:
+                self._session_cleanup_task = asyncio.create_task(self._session_cleanup_loop())
+
             logger.info("UserDatabase initialized successfully")
             return True
-            
+
         except Exception as e:
             logger.error(f"Error initializing UserDatabase: {e}")
             return False
+
+    @staticmethod
+    def _memo_get(key):
+        """Ambil hasil lookup dari memo per-request (None jika tidak ada)"""
+        cache = _request_cache.get()
+        if cache is None:
+            return None
+        return cache.get(key)
+
+    @staticmethod
+    def _memo_set(key, value):
+        """Simpan hasil lookup ke memo per-request"""
+        cache = _request_cache.get()
+        if cache is not None:
+            cache[key] = value
+        return value
+
+    def _cache_session(self, telegram_id: int, status: str, expires_at: datetime,
+                       username: str = None):
+        """Simpan hasil check_session di cache dengan LRU eviction"""
+        self._session_cache[telegram_id] = (status, expires_at, username, time.monotonic())
+        self._session_cache.move_to_end(telegram_id)
+        while len(self._session_cache) > Settings.SESSION_CACHE_MAX_ENTRIES:
+            self._session_cache.popitem(last=False)
+
+    def _invalidate_session_cache(self, telegram_id: int = None):
+        """Invalidate cache untuk satu telegram_id, atau semua jika None"""
+        if telegram_id is None:
+            self._session_cache.clear()
+        else:
+            self._session_cache.pop(telegram_id, None)
+
+    def _cache_admin(self, telegram_id: int, is_admin: bool):
+        """Simpan hasil is_admin di cache dengan LRU eviction"""
+        self._admin_cache[telegram_id] = (is_admin, time.monotonic())
+        self._admin_cache.move_to_end(telegram_id)
+        while len(self._admin_cache) > Settings.SESSION_CACHE_MAX_ENTRIES:
+            self._admin_cache.popitem(last=False)
+
+    def _invalidate_admin_cache(self):
+        """Invalidate cache admin, dipanggil saat status user berubah"""
+        self._admin_cache.clear()
+
+    async def _activity_flush_loop(self):
+        """Background task untuk flush batch last_activity updates"""
+        while True:
+            await asyncio.sleep(Settings.SESSION_ACTIVITY_FLUSH_SECONDS)
+            await self._flush_pending_activity()
+
+    async def _flush_pending_activity(self):
+        """Flush semua pending last_activity update dalam satu statement"""
+        if not self._pending_activity:
+            return
+
+        pending = self._pending_activity
+        self._pending_activity = set()
+
+        try:
+            placeholders = ', '.join(['%s'] * len(pending))
+            await db_manager.execute_query(f"""
+                UPDATE {self.sessions_table}
+                SET last_activity = %s
+                WHERE is_active = %s AND telegram_id IN ({placeholders})
+            """, (datetime.now(), True) + tuple(pending))
+
+        except Exception as e:
+            logger.error(f"Error flushing session activity: {e}")
     
+    async def _ensure_indexes(self):
+        """Pastikan index untuk query hot path ada (idempotent)
+
+        check_session filter di (telegram_id, is_active, expires_at) dan
+        lookup user by telegram_id jalan di setiap update; tanpa index
+        keduanya full scan.
+        """
+        await db_manager.ensure_index(
+            self.sessions_table, 'idx_sessions_tg_active',
+            'telegram_id, is_active, expires_at'
+        )
+        await db_manager.ensure_index(
+            self.table_name, 'idx_users_telegram_id', 'telegram_id'
+        )
+
     async def _ensure_admin_exists(self):
         """Pastikan akun admin ada"""
         try:
             existing_admin = await db_manager.fetch_one(
-                f"SELECT id FROM {self.table_name} WHERE username = %s",
+                self._SQL_GET_ID_BY_USERNAME,
                 (Settings.ADMIN_USERNAME,)
             )
-            
+
             if not existing_admin:
                 # Buat admin baru
-                query = f"""
-                    INSERT INTO {self.table_name} 
-                    (username, password, is_admin, status, created_at, 
-                     total_installs, success_installs, failed_installs)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                
-                await db_manager.execute_query(query, (
+                await db_manager.execute_query(self._SQL_INSERT_ADMIN, (
                     Settings.ADMIN_USERNAME,
                     Settings.ADMIN_PASSWORD,
                     True,
@@ -71,42 +314,28 @@ class UserDatabase:
         """Tambah user baru"""
         try:
             # Validasi input
-            if len(username) < Settings.MIN_USERNAME_LENGTH:
-                return False, f"Username minimum {Settings.MIN_USERNAME_LENGTH} characters"
-            
+            if not _USERNAME_RE.match(username):
+                return False, (
+                    f"Username must be {Settings.MIN_USERNAME_LENGTH}-64 "
+                    "alphanumeric characters"
+                )
+
             if len(password) < Settings.MIN_PASSWORD_LENGTH:
                 return False, f"Password minimum {Settings.MIN_PASSWORD_LENGTH} characters"
             
-            if not username.isalnum():
-                return False, "Username must be alphanumeric"
-            
-            # Cek apakah username sudah ada
-            existing = await db_manager.fetch_one(
-                f"SELECT id FROM {self.table_name} WHERE username = %s",
-                (username.lower(),)
-            )
-            
-            if existing:
+            # Cek username dan telegram_id dalam satu round-trip
+            conflict = await db_manager.fetch_one(self._SQL_CHECK_CONFLICT, (
+                username.lower(), telegram_id, username.lower(), telegram_id
+            ))
+
+            if conflict and conflict['name_taken']:
                 return False, "Username already exists"
-            
-            # Cek apakah telegram_id sudah digunakan (jika ada)
-            if telegram_id:
-                existing_telegram = await db_manager.fetch_one(
-                    f"SELECT id FROM {self.table_name} WHERE telegram_id = %s",
-                    (telegram_id,)
-                )
-                if existing_telegram:
-                    return False, "Telegram ID already registered"
-            
+
+            if telegram_id and conflict and conflict['tg_taken']:
+                return False, "Telegram ID already registered"
+
             # Insert user baru
-            query = f"""
-                INSERT INTO {self.table_name} 
-                (username, password, telegram_id, is_admin, status, created_at, 
-                 total_installs, success_installs, failed_installs)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            await db_manager.execute_query(query, (
+            await db_manager.execute_query(self._SQL_INSERT_USER, (
                 username.lower(),
                 password,
                 telegram_id,  # NULL untuk API users
@@ -116,6 +345,7 @@ class UserDatabase:
                 0, 0, 0
             ))
             
+            self._invalidate_tg_ids()
             logger.info(f"User {username} added (telegram_id: {telegram_id or 'NULL'})")
             return True, "User created successfully"
             
@@ -134,15 +364,22 @@ class UserDatabase:
         try:
             # Cari user berdasarkan username
             user = await db_manager.fetch_one(
-                f"SELECT id, password, status, is_admin, telegram_id FROM {self.table_name} WHERE username = %s",
+                self._SQL_GET_LOGIN,
                 (username.lower(),)
             )
             
             if not user:
+                # Dummy compare supaya latency user-tidak-ada mirip dengan
+                # password-salah (hindari user enumeration via timing)
+                hmac.compare_digest(b'dummy-password-padding', password.encode('utf-8'))
                 return False, "Invalid username or password"
-            
-            # Cek password
-            if user['password'] != password:
+
+            # Cek password (constant-time compare, hindari timing leak).
+            # Kalau storage pindah ke bcrypt/argon2, verifikasi wajib lewat
+            # run_in_executor supaya KDF tidak memblok event loop.
+            if not hmac.compare_digest(
+                user['password'].encode('utf-8'), password.encode('utf-8')
+            ):
                 return False, "Invalid username or password"
             
             # Cek status user
@@ -152,33 +389,30 @@ class UserDatabase:
             if user['status'] == Settings.STATUS_INACTIVE:
                 return False, "Account is inactive"
             
-            # Update login info
+            # Update login info (satu timestamp untuk seluruh method)
+            now = datetime.now()
             if telegram_id and telegram_id != 0:
-                # Login dari Telegram Bot - update atau link telegram_id
-                update_query = f"""
-                    UPDATE {self.table_name} 
-                    SET telegram_id = %s, last_login = %s 
-                    WHERE id = %s
-                """
-                await db_manager.execute_query(update_query, (
-                    telegram_id,
-                    datetime.now(),
-                    user['id']
-                ))
-                
-                # Buat session untuk Telegram
-                await self._create_user_session(user['id'], telegram_id)
+                # Login dari Telegram Bot: update/link telegram_id, nonaktifkan
+                # session lama, dan buat session baru dalam satu transaksi
+                expires_at = now + timedelta(hours=Settings.SESSION_DURATION_HOURS)
+                await db_manager.execute_transaction([
+                    (self._SQL_UPDATE_LOGIN_TG, (telegram_id, now, user['id'])),
+                    (self._SQL_DEACTIVATE_SESSIONS, (False, user['id'])),
+                    (self._SQL_INSERT_SESSION, (
+                        user['id'], telegram_id, now, now, expires_at, True
+                    )),
+                ])
+
+                self._invalidate_session_cache(telegram_id)
+                self._invalidate_session_gauge()
+                # telegram_id bisa baru ter-link, refresh cache broadcast
+                self._invalidate_tg_ids()
                 logger.info(f"User {username} logged in from Telegram {telegram_id}")
                 
             else:
                 # Login dari API - jangan ubah telegram_id
-                update_query = f"""
-                    UPDATE {self.table_name} 
-                    SET last_login = %s 
-                    WHERE id = %s
-                """
-                await db_manager.execute_query(update_query, (
-                    datetime.now(),
+                await db_manager.execute_query(self._SQL_UPDATE_LOGIN, (
+                    now,
                     user['id']
                 ))
                 logger.info(f"User {username} logged in from API")
@@ -192,54 +426,73 @@ class UserDatabase:
     async def check_session(self, telegram_id: int) -> bool:
         """Cek apakah user session masih valid (untuk Telegram Bot only)"""
         try:
+            now = datetime.now()
+
+            # Fast path: cache hit dalam TTL, tanpa round-trip DB
+            cached = self._session_cache.get(telegram_id)
+            if cached:
+                status, expires_at, _, cached_at = cached
+                if (time.monotonic() - cached_at < Settings.SESSION_CACHE_TTL_SECONDS
+                        and expires_at > now):
+                    self._session_cache.move_to_end(telegram_id)
+                    self._pending_activity.add(telegram_id)
+                    return status == Settings.STATUS_ACTIVE
+                self._session_cache.pop(telegram_id, None)
+
             # Cari session aktif
-            session = await db_manager.fetch_one(f"""
-                SELECT s.user_id, s.expires_at, u.status
-                FROM {self.sessions_table} s
-                JOIN {self.table_name} u ON s.user_id = u.id
-                WHERE s.telegram_id = %s AND s.is_active = %s AND s.expires_at > %s
-                ORDER BY s.login_time DESC
-                LIMIT 1
-            """, (telegram_id, True, datetime.now()))
-            
+            session = await db_manager.fetch_one(
+                self._SQL_CHECK_SESSION, (telegram_id, True, now)
+            )
+
             if session:
-                # Update last activity
-                await db_manager.execute_query(f"""
-                    UPDATE {self.sessions_table} 
-                    SET last_activity = %s 
-                    WHERE telegram_id = %s AND is_active = %s
-                """, (datetime.now(), telegram_id, True))
-                
+                # last_activity di-update batch oleh background flush
+                self._cache_session(
+                    telegram_id, session['status'], session['expires_at'],
+                    session['username']
+                )
+                self._pending_activity.add(telegram_id)
+
                 return session['status'] == Settings.STATUS_ACTIVE
-            
+
             return False
-            
+
         except Exception as e:
             logger.error(f"Error checking session: {e}")
             return False
     
+    # Getter user sengaja mengembalikan row dict dari driver tanpa wrapper
+    # type: aiomysql sudah membangun dict per row, dan semua consumer
+    # (handler format string, JSON encoder FastAPI) memakai mapping access.
+    # Wrapper class hanya menambah satu konversi per lookup di sini.
+
+    async def resolve_session(self, telegram_id: int) -> Tuple[bool, Optional[str]]:
+        """Cek session dan username dalam satu lookup
+
+        Cache hit = nol round-trip; username ikut tersimpan di session
+        cache jadi handler tidak perlu get_user_by_telegram_id terpisah.
+        """
+        logged_in = await self.check_session(telegram_id)
+
+        cached = self._session_cache.get(telegram_id)
+        username = cached[2] if cached else None
+        return logged_in, username
+
     async def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """Dapatkan user berdasarkan user_id (primary key)"""
         try:
-            user = await db_manager.fetch_one(f"""
-                SELECT id, username, password, telegram_id, is_admin, status, 
-                       created_at, last_login, total_installs, success_installs, failed_installs
-                FROM {self.table_name} 
-                WHERE id = %s
-            """, (user_id,))
-            
+            memo_key = ('id', user_id)
+            cached = self._memo_get(memo_key)
+            if cached is not None:
+                return cached
+
+            user = await db_manager.fetch_one(self._SQL_GET_BY_ID, (user_id,))
+
             if user:
-                user_dict = dict(user)
-                # Format datetime fields
-                if user_dict['created_at']:
-                    user_dict['created_at'] = user_dict['created_at'].isoformat()
-                if user_dict['last_login']:
-                    user_dict['last_login'] = user_dict['last_login'].isoformat()
-                
-                return user_dict
-            
+                # Row dikembalikan apa adanya; datetime diformat consumer
+                return self._memo_set(memo_key, user)
+
             return None
-            
+
         except Exception as e:
             logger.error(f"Error getting user by id: {e}")
             return None
@@ -247,25 +500,18 @@ class UserDatabase:
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[Tuple[str, Dict]]:
         """Dapatkan user berdasarkan telegram ID"""
         try:
-            user = await db_manager.fetch_one(f"""
-                SELECT id, username, password, telegram_id, is_admin, status, 
-                       created_at, last_login, total_installs, success_installs, failed_installs
-                FROM {self.table_name} 
-                WHERE telegram_id = %s
-            """, (telegram_id,))
-            
+            memo_key = ('tg', telegram_id)
+            cached = self._memo_get(memo_key)
+            if cached is not None:
+                return cached
+
+            user = await db_manager.fetch_one(self._SQL_GET_BY_TG, (telegram_id,))
+
             if user:
-                user_dict = dict(user)
-                # Format datetime fields
-                if user_dict['created_at']:
-                    user_dict['created_at'] = user_dict['created_at'].isoformat()
-                if user_dict['last_login']:
-                    user_dict['last_login'] = user_dict['last_login'].isoformat()
-                
-                return user['username'], user_dict
-            
+                return self._memo_set(memo_key, (user['username'], user))
+
             return None
-            
+
         except Exception as e:
             logger.error(f"Error getting user by telegram ID: {e}")
             return None
@@ -273,25 +519,18 @@ class UserDatabase:
     async def get_user_by_username(self, username: str) -> Optional[Dict]:
         """Dapatkan user berdasarkan username"""
         try:
-            user = await db_manager.fetch_one(f"""
-                SELECT id, username, password, telegram_id, is_admin, status, 
-                       created_at, last_login, total_installs, success_installs, failed_installs
-                FROM {self.table_name} 
-                WHERE username = %s
-            """, (username.lower(),))
-            
+            memo_key = ('username', username.lower())
+            cached = self._memo_get(memo_key)
+            if cached is not None:
+                return cached
+
+            user = await db_manager.fetch_one(self._SQL_GET_BY_USERNAME, (username.lower(),))
+
             if user:
-                user_dict = dict(user)
-                # Format datetime fields
-                if user_dict['created_at']:
-                    user_dict['created_at'] = user_dict['created_at'].isoformat()
-                if user_dict['last_login']:
-                    user_dict['last_login'] = user_dict['last_login'].isoformat()
-                
-                return user_dict
-            
+                return self._memo_set(memo_key, user)
+
             return None
-            
+
         except Exception as e:
             logger.error(f"Error getting user by username: {e}")
             return None
@@ -299,13 +538,32 @@ class UserDatabase:
     async def is_admin(self, telegram_id: int) -> bool:
         """Cek apakah user adalah admin"""
         try:
-            admin_check = await db_manager.fetch_one(f"""
-                SELECT is_admin 
-                FROM {self.table_name} 
-                WHERE telegram_id = %s AND status = %s
-            """, (telegram_id, Settings.STATUS_ACTIVE))
-            
-            return admin_check['is_admin'] if admin_check else False
+            # Jika user sudah di-lookup dalam request ini, jawab dari memo
+            cached_user = self._memo_get(('tg', telegram_id))
+            if cached_user is not None:
+                _, user_dict = cached_user
+                return bool(user_dict['is_admin']) and user_dict['status'] == Settings.STATUS_ACTIVE
+
+            memo_key = ('admin', telegram_id)
+            cached = self._memo_get(memo_key)
+            if cached is not None:
+                return cached
+
+            # Cache lintas-request dengan TTL, di-clear saat ban/unban/delete
+            entry = self._admin_cache.get(telegram_id)
+            if entry is not None:
+                is_admin, cached_at = entry
+                if time.monotonic() - cached_at < Settings.ADMIN_CACHE_TTL_SECONDS:
+                    return self._memo_set(memo_key, is_admin)
+                self._admin_cache.pop(telegram_id, None)
+
+            admin_check = await db_manager.fetch_one(
+                self._SQL_IS_ADMIN, (telegram_id, Settings.STATUS_ACTIVE)
+            )
+
+            is_admin = bool(admin_check['is_admin']) if admin_check else False
+            self._cache_admin(telegram_id, is_admin)
+            return self._memo_set(memo_key, is_admin)
             
         except Exception as e:
             logger.error(f"Error checking admin: {e}")
@@ -315,12 +573,10 @@ class UserDatabase:
         """Logout user dengan menghapus session"""
         try:
             # Nonaktifkan semua session untuk telegram_id ini
-            await db_manager.execute_query(f"""
-                UPDATE {self.sessions_table} 
-                SET is_active = %s 
-                WHERE telegram_id = %s
-            """, (False, telegram_id))
-            
+            await db_manager.execute_query(self._SQL_LOGOUT, (False, telegram_id))
+
+            self._invalidate_session_cache(telegram_id)
+            self._invalidate_session_gauge()
             logger.info(f"User with telegram_id {telegram_id} logged out")
             return True
             
@@ -329,33 +585,42 @@ class UserDatabase:
             return False
     
     async def update_install_stats(self, user_id: int, success: bool) -> bool:
-        """Update statistik instalasi user berdasarkan user_id"""
-        try:
-            if success:
-                query = f"""
-                    UPDATE {self.table_name} 
-                    SET total_installs = total_installs + 1, 
-                        success_installs = success_installs + 1
-                    WHERE id = %s
-                """
-            else:
-                query = f"""
-                    UPDATE {self.table_name} 
-                    SET total_installs = total_installs + 1, 
-                        failed_installs = failed_installs + 1
-                    WHERE id = %s
-                """
-            
-            result = await db_manager.execute_query(query, (user_id,))
-            
-            if result > 0:
-                logger.info(f"Updated install stats for user_id {user_id}: success={success}")
-            
-            return result > 0
-            
-        except Exception as e:
-            logger.error(f"Error updating install stats: {e}")
-            return False
+        """Update statistik instalasi user berdasarkan user_id
+
+        Increment di-buffer dan di-flush batch oleh background task,
+        jadi N instalasi beruntun jadi satu UPDATE per user per flush.
+        """
+        deltas = self._stats_buf.setdefault(user_id, [0, 0])
+        if success:
+            deltas[0] += 1
+        else:
+            deltas[1] += 1
+
+        logger.info(f"Buffered install stats for user_id {user_id}: success={success}")
+        return True
+
+    async def _stats_flush_loop(self):
+        """Background task untuk flush buffer install stats"""
+        while True:
+            await asyncio.sleep(Settings.INSTALL_STATS_FLUSH_SECONDS)
+            await self._flush_install_stats()
+
+    async def _flush_install_stats(self):
+        """Flush increment stats yang ter-buffer dalam satu transaksi"""
+        if not self._stats_buf:
+            return
+
+        buffered = self._stats_buf
+        self._stats_buf = {}
+
+        operations = [
+            (self._SQL_FLUSH_STATS, (success + failed, success, failed, user_id))
+            for user_id, (success, failed) in buffered.items()
+        ]
+
+        success_flush = await db_manager.execute_transaction(operations)
+        if not success_flush:
+            logger.error(f"Error flushing install stats for {len(operations)} users")
     
     async def delete_user(self, username: str) -> Tuple[bool, str]:
         """Hapus user (admin only)"""
@@ -365,19 +630,20 @@ class UserDatabase:
             
             # Cek apakah user ada
             user = await db_manager.fetch_one(
-                f"SELECT id FROM {self.table_name} WHERE username = %s",
+                self._SQL_GET_ID_BY_USERNAME,
                 (username.lower(),)
             )
-            
+
             if not user:
                 return False, "User not found"
-            
+
             # Hapus user (CASCADE akan hapus related records)
-            await db_manager.execute_query(
-                f"DELETE FROM {self.table_name} WHERE id = %s",
-                (user['id'],)
-            )
+            await db_manager.execute_query(self._SQL_DELETE_USER, (user['id'],))
             
+            self._invalidate_session_cache()
+            self._invalidate_session_gauge()
+            self._invalidate_admin_cache()
+            self._invalidate_tg_ids()
             logger.info(f"User {username} deleted")
             return True, "User deleted successfully"
             
@@ -391,20 +657,18 @@ class UserDatabase:
             if username.lower() == Settings.ADMIN_USERNAME.lower():
                 return False, "Cannot ban admin account"
             
-            result = await db_manager.execute_query(f"""
-                UPDATE {self.table_name} 
-                SET status = %s 
-                WHERE username = %s
-            """, (Settings.STATUS_BANNED, username.lower()))
-            
+            # Multi-table UPDATE: ban user dan nonaktifkan session sekaligus
+            result = await db_manager.execute_query(
+                self._SQL_BAN_USER,
+                (Settings.STATUS_BANNED, False, username.lower())
+            )
+
             if result > 0:
-                # Nonaktifkan semua session user ini
-                await db_manager.execute_query(f"""
-                    UPDATE {self.sessions_table} 
-                    SET is_active = %s 
-                    WHERE user_id = (SELECT id FROM {self.table_name} WHERE username = %s)
-                """, (False, username.lower()))
-                
+                # Username-based op: tidak tahu telegram_id, clear semua
+                self._invalidate_session_cache()
+                self._invalidate_session_gauge()
+                self._invalidate_admin_cache()
+                self._invalidate_tg_ids()
                 return True, f"User {username} banned successfully"
             else:
                 return False, "User not found"
@@ -416,13 +680,14 @@ class UserDatabase:
     async def unban_user(self, username: str) -> Tuple[bool, str]:
         """Unban user"""
         try:
-            result = await db_manager.execute_query(f"""
-                UPDATE {self.table_name} 
-                SET status = %s 
-                WHERE username = %s AND status = %s
-            """, (Settings.STATUS_ACTIVE, username.lower(), Settings.STATUS_BANNED))
+            result = await db_manager.execute_query(
+                self._SQL_UNBAN_USER,
+                (Settings.STATUS_ACTIVE, username.lower(), Settings.STATUS_BANNED)
+            )
             
             if result > 0:
+                self._invalidate_admin_cache()
+                self._invalidate_tg_ids()
                 return True, f"User {username} unbanned successfully"
             else:
                 return False, "User not found or not banned"
@@ -431,50 +696,51 @@ class UserDatabase:
             logger.error(f"Error unbanning user: {e}")
             return False, f"System error: {str(e)}"
     
-    async def get_all_telegram_ids(self) -> List[int]:
+    def _invalidate_tg_ids(self):
+        """Invalidate cache telegram ID broadcast"""
+        self._tg_ids_cache = None
+
+    def _invalidate_session_gauge(self):
+        """Invalidate gauge session aktif, recount di read berikutnya"""
+        self._session_gauge = None
+
+    async def get_all_telegram_ids(self) -> Tuple[int, ...]:
         """Dapatkan semua telegram ID aktif untuk broadcast"""
         try:
-            users = await db_manager.fetch_all(f"""
-                SELECT telegram_id 
-                FROM {self.table_name} 
-                WHERE telegram_id IS NOT NULL AND status = %s
-            """, (Settings.STATUS_ACTIVE,))
-            
-            return [user['telegram_id'] for user in users if user['telegram_id']]
-            
+            if self._tg_ids_cache is not None:
+                return self._tg_ids_cache
+
+            users = await db_manager.fetch_all(
+                self._SQL_GET_TG_IDS, (Settings.STATUS_ACTIVE,)
+            )
+
+            self._tg_ids_cache = tuple(
+                user['telegram_id'] for user in users if user['telegram_id']
+            )
+            return self._tg_ids_cache
+
         except Exception as e:
             logger.error(f"Error getting all telegram IDs: {e}")
-            return []
+            return ()
     
+    @staticmethod
+    def _format_user_row(user: Dict) -> Dict:
+        """Format satu row user list untuk display"""
+        # Tanggal sudah string dari DATE_FORMAT, tinggal fallback NULL
+        user['created_at'] = user['created_at'] or 'Unknown'
+        user['last_login'] = user['last_login'] or 'Never'
+        return user
+
+    async def iter_user_list(self):
+        """Stream daftar semua user tanpa buffer penuh di memory"""
+        async for user in db_manager.fetch_iter(self._SQL_USER_LIST):
+            yield self._format_user_row(user)
+
     async def get_user_list(self) -> List[Dict]:
         """Dapatkan daftar semua user"""
         try:
-            users = await db_manager.fetch_all(f"""
-                SELECT username, is_admin, status, total_installs, success_installs, 
-                       failed_installs, created_at, last_login, telegram_id
-                FROM {self.table_name} 
-                ORDER BY created_at DESC
-            """)
-            
-            formatted_users = []
-            for user in users:
-                formatted_user = dict(user)
-                
-                # Format datetime
-                if formatted_user['created_at']:
-                    formatted_user['created_at'] = formatted_user['created_at'].isoformat()
-                else:
-                    formatted_user['created_at'] = 'Unknown'
-                
-                if formatted_user['last_login']:
-                    formatted_user['last_login'] = formatted_user['last_login'].isoformat()
-                else:
-                    formatted_user['last_login'] = 'Never'
-                
-                formatted_users.append(formatted_user)
-            
-            return formatted_users
-            
+            return [user async for user in self.iter_user_list()]
+
         except Exception as e:
             logger.error(f"Error getting user list: {e}")
             return []
@@ -482,21 +748,19 @@ class UserDatabase:
     async def get_user_stats(self) -> Dict[str, int]:
         """Dapatkan statistik user"""
         try:
-            stats = await db_manager.fetch_one(f"""
-                SELECT 
-                    COUNT(*) as total_users,
-                    SUM(CASE WHEN status = %s THEN 1 ELSE 0 END) as active_users,
-                    SUM(CASE WHEN status = %s THEN 1 ELSE 0 END) as banned_users,
-                    SUM(CASE WHEN is_admin = 1 THEN 1 ELSE 0 END) as admin_users,
-                    SUM(CASE WHEN telegram_id IS NOT NULL THEN 1 ELSE 0 END) as users_with_telegram,
-                    SUM(CASE WHEN telegram_id IS NULL THEN 1 ELSE 0 END) as api_only_users,
-                    SUM(total_installs) as total_installations,
-                    SUM(success_installs) as successful_installations,
-                    SUM(failed_installs) as failed_installations
-                FROM {self.table_name}
-            """, (Settings.STATUS_ACTIVE, Settings.STATUS_BANNED))
-            
-            return dict(stats) if stats else {}
+            # Statistik berubah lambat, cukup refresh per TTL
+            if self._user_stats_cache is not None:
+                stats, cached_at = self._user_stats_cache
+                if time.monotonic() - cached_at < Settings.STATS_CACHE_TTL_SECONDS:
+                    return stats
+
+            stats = await db_manager.fetch_one(
+                self._SQL_USER_STATS, (Settings.STATUS_ACTIVE, Settings.STATUS_BANNED)
+            )
+
+            result = dict(stats) if stats else {}
+            self._user_stats_cache = (result, time.monotonic())
+            return result
             
         except Exception as e:
             logger.error(f"Error getting user stats: {e}")
@@ -508,76 +772,68 @@ class UserDatabase:
             if not telegram_id or telegram_id == 0:
                 logger.debug("Skipping session creation for API user")
                 return True
-            
-            # Nonaktifkan session lama
-            await db_manager.execute_query(f"""
-                UPDATE {self.sessions_table} 
-                SET is_active = %s 
-                WHERE user_id = %s
-            """, (False, user_id))
-            
-            # Buat session baru
-            expires_at = datetime.now() + timedelta(hours=Settings.SESSION_DURATION_HOURS)
-            
-            await db_manager.execute_query(f"""
-                INSERT INTO {self.sessions_table} 
-                (user_id, telegram_id, login_time, last_activity, expires_at, is_active)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                user_id,
-                telegram_id,
-                datetime.now(),
-                datetime.now(),
-                expires_at,
-                True
-            ))
-            
+
+            # Deactivate lama + insert baru dalam satu transaksi
+            now = datetime.now()
+            expires_at = now + timedelta(hours=Settings.SESSION_DURATION_HOURS)
+
+            await db_manager.execute_transaction([
+                (self._SQL_DEACTIVATE_SESSIONS, (False, user_id)),
+                (self._SQL_INSERT_SESSION, (
+                    user_id, telegram_id, now, now, expires_at, True
+                )),
+            ])
+
+            self._invalidate_session_cache(telegram_id)
+            self._invalidate_session_gauge()
             return True
-            
+
         except Exception as e:
             logger.error(f"Error creating session: {e}")
             return False
     
+    async def _session_cleanup_loop(self):
+        """Background task untuk cleanup session periodik"""
+        while True:
+            await asyncio.sleep(Settings.SESSION_CLEANUP_INTERVAL_SECONDS)
+            await self._cleanup_expired_sessions()
+
     async def _cleanup_expired_sessions(self):
         """Bersihkan session yang sudah expired"""
         try:
-            # Update session expired menjadi inactive
-            result = await db_manager.execute_query(f"""
-                UPDATE {self.sessions_table} 
-                SET is_active = %s 
-                WHERE expires_at < %s AND is_active = %s
-            """, (False, datetime.now(), True))
-            
+            now = datetime.now()
+            cleanup_date = now - timedelta(hours=Settings.CLEANUP_EXPIRED_SESSIONS_HOURS)
+
+            # Satu statement: hapus session expired dan session lama nonaktif
+            result = await db_manager.execute_query(
+                self._SQL_PURGE_SESSIONS, (False, cleanup_date, now)
+            )
+
             if result > 0:
                 logger.info(f"Cleaned up {result} expired sessions")
-            
-            # Hapus session lama yang sudah tidak aktif
-            cleanup_date = datetime.now() - timedelta(hours=Settings.CLEANUP_EXPIRED_SESSIONS_HOURS)
-            await db_manager.execute_query(f"""
-                DELETE FROM {self.sessions_table} 
-                WHERE is_active = %s AND last_activity < %s
-            """, (False, cleanup_date))
-            
+                self._invalidate_session_gauge()
+
         except Exception as e:
             logger.error(f"Error cleaning up expired sessions: {e}")
     
     async def get_active_sessions_count(self, user_id: int = None) -> int:
         """Dapatkan jumlah session aktif"""
         try:
+            now = datetime.now()
             if user_id:
-                result = await db_manager.fetch_one(f"""
-                    SELECT COUNT(*) as count 
-                    FROM {self.sessions_table} 
-                    WHERE user_id = %s AND is_active = %s AND expires_at > %s
-                """, (user_id, True, datetime.now()))
-            else:
-                result = await db_manager.fetch_one(f"""
-                    SELECT COUNT(*) as count 
-                    FROM {self.sessions_table} 
-                    WHERE is_active = %s AND expires_at > %s
-                """, (True, datetime.now()))
-            
-            return result['count'] if result else 0
+                result = await db_manager.fetch_one(
+                    self._SQL_COUNT_SESSIONS_USER, (user_id, True, now)
+                )
+                return result['count'] if result else 0
+
+            # Global count dijawab dari gauge; recount hanya setelah invalidate
+            if self._session_gauge is None:
+                result = await db_manager.fetch_one(
+                    self._SQL_COUNT_SESSIONS_ALL, (True, now)
+                )
+                self._session_gauge = result['count'] if result else 0
+
+            return self._session_gauge
             
         except Exception as e:
             logger.error(f"Error getting active sessions count: {e}")
@@ -585,6 +841,6 @@ class UserDatabase:
     
     async def save(self) -> bool:
         """Save method untuk backward compatibility"""
-        # Cleanup sessions sebagai pengganti
-        await self._cleanup_expired_sessions()
+        # Flush buffer stats; cleanup session ditangani background task
+        await self._flush_install_stats()
         return True
\ No newline at end of file
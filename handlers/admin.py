@@ -5,8 +5,11 @@ Menangani user management, broadcast, monitoring sistem, dan database management
 
 import logging
 import asyncio
+import heapq
+import operator
+import time
 import psutil
-from datetime import datetime
+from typing import Optional, Tuple
 from telegram import Update
 from telegram.ext import ContextTypes
 
@@ -15,10 +18,25 @@ from database.users import UserDatabase
 from database.installations import InstallationDatabase
 from database.connection import db_manager
 from utils.messages import Messages
-from utils.helpers import handle_errors, require_admin, chunk_message
+from utils.helpers import handle_errors, require_admin
 
 logger = logging.getLogger(__name__)
 
+# Flat map os_code -> display name, dibangun sekali saat import
+_OS_NAMES = {code: info.get('name', code) for code, info in Settings.WINDOWS_OS.items()}
+
+# Satu itemgetter C-level per row userlist, bukan 9 subscript dict
+_USER_ROW = operator.itemgetter(
+    'username', 'is_admin', 'status', 'total_installs', 'success_installs',
+    'failed_installs', 'created_at', 'last_login', 'telegram_id'
+)
+
+# Bound method format: satu call C-level per blok user
+_USER_TEMPLATE = (
+    "Username: {}\nStatus: {}\nTotal: {}\nSuccess: {}\nFailed: {}\n"
+    "Created: {}\nLogin: {}\nTelegram: {}\n---"
+).format
+
 
 class AdminHandler:
     """Handler untuk admin commands"""
@@ -26,21 +44,57 @@ class AdminHandler:
     def __init__(self, user_db: UserDatabase, install_db: InstallationDatabase):
         self.user_db = user_db
         self.install_db = install_db
-    
+        # Cache panel admin: (message, cached_at), TTL pendek
+        self._panel_cache: Optional[Tuple[str, float]] = None
+        # Metrics system di-sample background task, panel tinggal baca
+        self._metrics = None
+        self._metrics_task: Optional[asyncio.Task] = None
+        # Seed sampler CPU supaya call interval=None berikutnya bermakna
+        psutil.cpu_percent(interval=None)
+
+    @staticmethod
+    def _sample_metrics():
+        """Ambil satu snapshot metrics system (jalan di thread)"""
+        return (
+            psutil.cpu_percent(interval=None),
+            psutil.virtual_memory(),
+            psutil.disk_usage('/')
+        )
+
+    async def _metrics_sample_loop(self):
+        """Background task sampling metrics system periodik"""
+        while True:
+            self._metrics = await asyncio.to_thread(self._sample_metrics)
+            await asyncio.sleep(Settings.METRICS_SAMPLE_INTERVAL_SECONDS)
+
     @handle_errors
     @require_admin
     async def adminpanel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handler untuk command /adminpanel"""
         try:
-            # System statistics
-            cpu = psutil.cpu_percent(interval=1)
-            mem = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            
-            # Database statistics
-            install_stats = await self.install_db.get_stats()
-            user_stats = await self.user_db.get_user_stats()
-            
+            # Jawab dari cache selama TTL, polling admin tidak hammer DB
+            if self._panel_cache is not None:
+                cached_message, cached_at = self._panel_cache
+                if time.monotonic() - cached_at < Settings.ADMIN_PANEL_CACHE_TTL_SECONDS:
+                    await update.message.reply_text(cached_message)
+                    return
+
+            # System statistics dari background sampler; start lazy karena
+            # __init__ jalan sebelum event loop hidup
+            if self._metrics_task is None:
+                self._metrics_task = asyncio.create_task(self._metrics_sample_loop())
+
+            if self._metrics is None:
+                self._metrics = await asyncio.to_thread(self._sample_metrics)
+
+            cpu, mem, disk = self._metrics
+
+            # Database statistics, dua query jalan paralel
+            install_stats, user_stats = await asyncio.gather(
+                self.install_db.get_stats(),
+                self.user_db.get_user_stats()
+            )
+
             # Format message
             message = Messages.ADMIN_MENU.format(
                 cpu=cpu,
@@ -55,11 +109,12 @@ class AdminHandler:
                 completed=install_stats.get('completed', 0),
                 failed=install_stats.get('failed', 0)
             )
-            
+
+            self._panel_cache = (message, time.monotonic())
             await update.message.reply_text(message)
-            
+
         except Exception as e:
-            logger.error(f"Error in adminpanel: {e}")
+            logger.exception("Error in adminpanel")
             await update.message.reply_text(Messages.ADMIN_STATS_ERROR)
     
     @handle_errors
@@ -73,55 +128,46 @@ class AdminHandler:
                 await update.message.reply_text(Messages.NO_USERS_FOUND)
                 return
             
-            # Format user list
+            # Format user list, flush incremental saat mendekati limit pesan
+            chunks = []
             message_lines = [Messages.USER_LIST_HEADER]
-            
+            buffered = len(Messages.USER_LIST_HEADER)
+
             for user in users[:20]:  # Limit 20 users per message
-                status_text = "Admin" if user['is_admin'] else "User"
-                if user['status'] != 'active':
-                    status_text += f" ({user['status']})"
-                
-                # Format dates
-                created = user['created_at']
-                if isinstance(created, str):
-                    try:
-                        created_date = datetime.fromisoformat(created)
-                        created = created_date.strftime('%Y-%m-%d')
-                    except:
-                        created = created[:10] if len(created) >= 10 else created
-                
-                last_login = user['last_login']
-                if last_login and last_login != 'Never':
-                    if isinstance(last_login, str):
-                        try:
-                            login_date = datetime.fromisoformat(last_login)
-                            last_login = login_date.strftime('%m-%d %H:%M')
-                        except:
-                            last_login = last_login[:16] if len(last_login) >= 16 else last_login
-                
-                message_lines.append(f"Username: {user['username']}")
-                message_lines.append(f"Status: {status_text}")
-                message_lines.append(f"Total: {user['total_installs']}")
-                message_lines.append(f"Success: {user['success_installs']}")
-                message_lines.append(f"Failed: {user['failed_installs']}")
-                message_lines.append(f"Created: {created}")
-                message_lines.append(f"Login: {last_login}")
-                message_lines.append(f"Telegram: {'Yes' if user.get('telegram_id') else 'No'}")
-                message_lines.append("---")
-            
+                (username, is_admin, user_status, total, success, failed,
+                 created, last_login, tg_id) = _USER_ROW(user)
+
+                status_text = "Admin" if is_admin else "User"
+                if user_status != 'active':
+                    status_text += f" ({user_status})"
+
+                # Tanggal sudah diformat di query, satu format call per user
+                block = _USER_TEMPLATE(
+                    username, status_text, total, success, failed,
+                    created, last_login, "Yes" if tg_id else "No"
+                )
+
+                if buffered + len(block) + 1 > 3800:
+                    chunks.append('\n'.join(message_lines))
+                    message_lines = []
+                    buffered = 0
+
+                message_lines.append(block)
+                buffered += len(block) + 1
+
             if len(users) > 20:
                 message_lines.append(f"\n... and {len(users) - 20} more users")
                 message_lines.append("Use /dbstats for complete statistics")
-            
-            message = '\n'.join(message_lines)
-            
-            # Send in chunks if too long
-            chunks = chunk_message(message, 4000)
-            for chunk in chunks:
-                await update.message.reply_text(chunk)
+
+            chunks.append('\n'.join(message_lines))
+
+            # Kirim semua chunk paralel, round-trip Telegram overlap
+            await asyncio.gather(
+                *(update.message.reply_text(chunk) for chunk in chunks)
+            )
                 
         except Exception as e:
-            logger.error(f"Error in userlist: {e}")
+            logger.exception("Error in userlist")
             await update.message.reply_text("Error retrieving user list")
     
     @handle_errors
@@ -134,9 +180,16 @@ class AdminHandler:
                 return
             
             username, password = context.args
-            
+
+            # Typing action overlap dengan DB write, latency terasa =
+            # max(DB, Telegram) bukan jumlahnya
+            typing_task = asyncio.create_task(
+                update.message.reply_chat_action('typing')
+            )
+
             # Add user without telegram_id (for manual addition)
             success, reason = await self.user_db.add_user(username, password)
+            await asyncio.gather(typing_task, return_exceptions=True)
             
             if success:
                 await update.message.reply_text(
@@ -148,7 +201,7 @@ class AdminHandler:
                 )
                 
         except Exception as e:
-            logger.error(f"Error in adduser: {e}")
+            logger.exception("Error in adduser")
             await update.message.reply_text("Error adding user")
     
     @handle_errors
@@ -161,8 +214,13 @@ class AdminHandler:
                 return
             
             username = context.args[0]
-            
+
+            typing_task = asyncio.create_task(
+                update.message.reply_chat_action('typing')
+            )
+
             success, reason = await self.user_db.delete_user(username)
+            await asyncio.gather(typing_task, return_exceptions=True)
             
             if success:
                 await update.message.reply_text(
@@ -174,7 +232,7 @@ class AdminHandler:
                 )
                 
         except Exception as e:
-            logger.error(f"Error in deleteuser: {e}")
+            logger.exception("Error in deleteuser")
             await update.message.reply_text("Error deleting user")
     
     @handle_errors
@@ -187,8 +245,13 @@ class AdminHandler:
                 return
             
             username = context.args[0]
-            
+
+            typing_task = asyncio.create_task(
+                update.message.reply_chat_action('typing')
+            )
+
             success, reason = await self.user_db.ban_user(username)
+            await asyncio.gather(typing_task, return_exceptions=True)
             
             if success:
                 await update.message.reply_text(Messages.USER_BANNED.format(username=username))
@@ -196,7 +259,7 @@ class AdminHandler:
                 await update.message.reply_text(Messages.USER_BAN_FAILED.format(reason=reason))
                 
         except Exception as e:
-            logger.error(f"Error in banuser: {e}")
+            logger.exception("Error in banuser")
             await update.message.reply_text("Error banning user")
     
     @handle_errors
@@ -209,8 +272,13 @@ class AdminHandler:
                 return
             
             username = context.args[0]
-            
+
+            typing_task = asyncio.create_task(
+                update.message.reply_chat_action('typing')
+            )
+
             success, reason = await self.user_db.unban_user(username)
+            await asyncio.gather(typing_task, return_exceptions=True)
             
             if success:
                 await update.message.reply_text(Messages.USER_UNBANNED.format(username=username))
@@ -218,7 +286,7 @@ class AdminHandler:
                 await update.message.reply_text(Messages.USER_UNBAN_FAILED.format(reason=reason))
                 
         except Exception as e:
-            logger.error(f"Error in unbanuser: {e}")
+            logger.exception("Error in unbanuser")
             await update.message.reply_text("Error unbanning user")
     
     @handle_errors
@@ -239,22 +307,31 @@ class AdminHandler:
                 await update.message.reply_text(Messages.NO_ACTIVE_USERS)
                 return
             
-            # Send broadcast
-            success_count = 0
-            failed_count = 0
-            
+            # Send broadcast paralel dengan concurrency terbatas; template
+            # diformat sekali di sini, bukan per recipient di dalam fan-out
             broadcast_message = Messages.BROADCAST_MESSAGE.format(message=message)
-            
-            for telegram_id in telegram_ids:
-                try:
-                    await context.bot.send_message(telegram_id, broadcast_message)
-                    success_count += 1
-                    # Small delay to avoid rate limiting
-                    await asyncio.sleep(0.1)
-                except Exception as e:
-                    logger.warning(f"Failed to send broadcast to {telegram_id}: {e}")
-                    failed_count += 1
-            
+            semaphore = asyncio.Semaphore(Settings.BROADCAST_CONCURRENCY)
+
+            async def send_one(telegram_id: int) -> bool:
+                async with semaphore:
+                    try:
+                        await context.bot.send_message(telegram_id, broadcast_message)
+                        return True
+                    except Exception as e:
+                        logger.warning("Failed to send broadcast to %s: %s", telegram_id, e)
+                        return False
+                    finally:
+                        # Tahan permit 1 detik: throughput maksimal
+                        # BROADCAST_CONCURRENCY pesan/detik (limit Telegram ~30)
+                        await asyncio.sleep(1)
+
+            results = await asyncio.gather(
+                *(send_one(telegram_id) for telegram_id in telegram_ids)
+            )
+
+            success_count = sum(1 for r in results if r)
+            failed_count = len(results) - success_count
+
             await update.message.reply_text(
                 Messages.BROADCAST_SENT.format(
                     success=success_count,
@@ -264,7 +341,7 @@ class AdminHandler:
             )
             
         except Exception as e:
-            logger.error(f"Error in broadcast: {e}")
+            logger.exception("Error in broadcast")
             await update.message.reply_text("Error sending broadcast")
     
     @handle_errors
@@ -272,15 +349,13 @@ class AdminHandler:
     async def cleanup(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handler untuk command /cleanup"""
         try:
-            # Cleanup stuck installations
-            stuck = await self.install_db.cleanup_stuck_installations()
-            
-            # Cleanup old installations
-            old = await self.install_db.cleanup_old_installations()
-            
-            # Cleanup expired sessions
-            await self.user_db._cleanup_expired_sessions()
-            
+            # Tiga cleanup independen, jalan paralel di koneksi pool terpisah
+            stuck, old, _ = await asyncio.gather(
+                self.install_db.cleanup_stuck_installations(),
+                self.install_db.cleanup_old_installations(),
+                self.user_db._cleanup_expired_sessions()
+            )
+
             total = stuck + old
             
             await update.message.reply_text(
@@ -292,7 +367,7 @@ class AdminHandler:
             )
             
         except Exception as e:
-            logger.error(f"Error in cleanup: {e}")
+            logger.exception("Error in cleanup")
             await update.message.reply_text("Error performing cleanup")
     
     @handle_errors
@@ -318,7 +393,7 @@ class AdminHandler:
             await update.message.reply_text(message)
             
         except Exception as e:
-            logger.error(f"Error in dbstatus: {e}")
+            logger.exception("Error in dbstatus")
             await update.message.reply_text("Error retrieving database status")
     
     @handle_errors
@@ -326,11 +401,11 @@ class AdminHandler:
     async def dbstats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handler untuk command /dbstats"""
         try:
-            # Installation statistics
-            install_stats = await self.install_db.get_stats()
-            
-            # User statistics
-            user_stats = await self.user_db.get_user_stats()
+            # Dua query statistik jalan paralel, hasil di-share cache TTL
+            install_stats, user_stats = await asyncio.gather(
+                self.install_db.get_stats(),
+                self.user_db.get_user_stats()
+            )
             
             message = Messages.DB_STATS_HEADER.format(
                 users=user_stats.get('total_users', 0),
@@ -342,15 +417,14 @@ class AdminHandler:
             os_stats = install_stats.get('os_stats', {})
             if os_stats:
                 message += "\n\nTop OS Installations:"
-                top_os = sorted(os_stats.items(), key=lambda x: x[1], reverse=True)[:5]
+                top_os = heapq.nlargest(5, os_stats.items(), key=operator.itemgetter(1))
                 for os_code, count in top_os:
-                    os_name = Settings.WINDOWS_OS.get(os_code, {}).get('name', os_code)
-                    message += f"\n- {os_name}: {count}"
+                    message += f"\n- {_OS_NAMES.get(os_code, os_code)}: {count}"
             
             await update.message.reply_text(message)
             
         except Exception as e:
-            logger.error(f"Error in dbstats: {e}")
+            logger.exception("Error in dbstats")
             await update.message.reply_text("Error retrieving database statistics")
     
     @handle_errors
@@ -364,22 +438,29 @@ class AdminHandler:
                 await update.message.reply_text(Messages.LOG_FILE_NOT_FOUND)
                 return
             
-            # Read last 50 lines
-            with open(log_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                last_lines = lines[-50:] if len(lines) > 50 else lines
-            
-            log_text = ''.join(last_lines)
+            # Read last 50 lines: seek ke tail file, bukan baca seluruh file
+            log_text = await asyncio.to_thread(self._tail_log, log_file)
             
             # Truncate if too long
             if len(log_text) > 3800:
                 log_text = "...\n" + log_text[-3800:]
-            
-            message = Messages.LOG_CONTENT.format(content=log_text)
-            
+
             # Use monospace formatting for logs
             await update.message.reply_text(f"```\n{log_text}\n```", parse_mode='Markdown')
             
         except Exception as e:
-            logger.error(f"Error in logs: {e}")
-            await update.message.reply_text(Messages.LOG_READ_ERROR)
\ No newline at end of file
+            logger.exception("Error in logs")
+            await update.message.reply_text(Messages.LOG_READ_ERROR)
+
+    @staticmethod
+    def _tail_log(log_file, max_lines: int = 50, max_bytes: int = 16384) -> str:
+        """Baca N baris terakhir log file tanpa load seluruh file"""
+        size = log_file.stat().st_size
+        chunk = min(size, max_bytes)
+
+        with open(log_file, 'rb') as f:
+            f.seek(size - chunk)
+            data = f.read(chunk)
+
+        lines = data.splitlines()[-max_lines:]
+        return b'\n'.join(lines).decode('utf-8', 'replace')
\ No newline at end of file
@@ -25,14 +25,13 @@ class AuthHandler:
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handler untuk command /start"""
         user_id = update.effective_user.id
-        
-        # Cek apakah user sudah login
-        if await self.user_db.check_session(user_id):
-            user_data = await self.user_db.get_user_by_telegram_id(user_id)
-            username = user_data[0] if user_data else "User"
-            
+
+        # Cek login + username satu lookup (cache hit = nol query)
+        logged_in, username = await self.user_db.resolve_session(user_id)
+
+        if logged_in:
             await update.message.reply_text(
-                Messages.WELCOME_BACK.format(username=username)
+                Messages.WELCOME_BACK.format(username=username or "User")
             )
         else:
             await update.message.reply_text(Messages.WELCOME)
@@ -117,16 +116,15 @@ class AuthHandler:
     async def logout(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handler untuk command /logout"""
         telegram_id = update.effective_user.id
-        
-        # Cek apakah user sudah login
-        if not await self.user_db.check_session(telegram_id):
+
+        # Cek login + ambil username sebelum logout, satu lookup
+        logged_in, username = await self.user_db.resolve_session(telegram_id)
+        if not logged_in:
             await update.message.reply_text(Messages.NOT_LOGGED_IN)
             return
-        
-        # Dapatkan username sebelum logout
-        user_data = await self.user_db.get_user_by_telegram_id(telegram_id)
-        username = user_data[0] if user_data else "User"
-        
+
+        username = username or "User"
+
         # Logout
         success = await self.user_db.logout(telegram_id)
         
@@ -6,6 +6,7 @@ Port RDP otomatis 22, cross-platform notifications
 
 import logging
 import asyncio
+import time
 from typing import Dict, Any, Tuple, Optional
 from telegram import Update
 from telegram.ext import ContextTypes
@@ -13,7 +14,7 @@ from telegram.ext import ContextTypes
 from config.settings import Settings
 from database.users import UserDatabase
 from database.installations import InstallationDatabase
-from core.ssh_manager import SSHManager
+from core.ssh_manager import SSHConnectionPool
 from utils.messages import Messages
 from utils.helpers import (
     handle_errors, require_login, Validators,
@@ -22,6 +23,34 @@ from utils.helpers import (
 
 logger = logging.getLogger(__name__)
 
+# Bound .format untuk template hasil gagal: lookup atribut + method
+# resolve dibayar sekali di import, bukan di tiap failure path
+_FAILED_RESULT = Messages.INSTALL_FAILED_RESULT.format
+
+# Label status untuk /history, konstan jadi cukup dibangun sekali
+_STATUS_TEXT = {
+    Settings.INSTALL_STATUS_COMPLETED: "[COMPLETED]",
+    Settings.INSTALL_STATUS_FAILED: "[FAILED]",
+    Settings.INSTALL_STATUS_TIMEOUT: "[TIMEOUT]",
+}
+
+
+def _format_history_row(install: Dict[str, Any]) -> str:
+    """Format satu baris riwayat instalasi jadi blok multi-line"""
+    status_text = _STATUS_TEXT.get(install['status'], "[IN PROGRESS]")
+    date = install['start_time'][:10] if install['start_time'] else 'Unknown'
+
+    row = (
+        f"{status_text} {install['os_name']}\n"
+        f"   IP: {install['ip']}\n"
+        f"   Date: {date}"
+    )
+
+    if install['status'] == Settings.INSTALL_STATUS_COMPLETED and install.get('rdp_info'):
+        row += f"\n   RDP Port: {Settings.RDP_PORT}"
+
+    return row
+
 
 class InstallHandler:
     """Handler untuk instalasi Windows dengan unified flow"""
@@ -30,9 +59,32 @@ class InstallHandler:
         self.user_db = user_db
         self.install_db = install_db
         self.active_installations: Dict[str, asyncio.Task] = {}
+        self.ssh_pool = SSHConnectionPool()
+        self._install_sem = asyncio.Semaphore(Settings.MAX_CONCURRENT_INSTALLS)
+        self._host_sems: Dict[str, asyncio.Semaphore] = {}
         self.notification_service = NotificationService()
         self.notification_service.set_databases(user_db, install_db)
         self.progress_manager = InstallationProgressManager()
+        # WINDOWS_OS statis, render pesan /oslist sekali saja
+        self._oslist_message = self._build_oslist_message()
+
+    @staticmethod
+    def _build_oslist_message() -> str:
+        """Render pesan /oslist dari Settings.WINDOWS_OS"""
+        servers = []
+        desktops = []
+
+        for code, info in Settings.WINDOWS_OS.items():
+            line = f"{code} - {info['name']}"
+            if info.get('category') == 'server':
+                servers.append(line)
+            else:
+                desktops.append(line)
+
+        return Messages.OS_LIST.format(
+            servers='\n'.join([f"- {s}" for s in servers]),
+            desktops='\n'.join([f"- {d}" for d in desktops])
+        )
     
     @handle_errors
     @require_login
@@ -69,13 +121,18 @@ class InstallHandler:
             await update.message.reply_text(Messages.ERROR_INVALID_PASSWORD)
             return
         
-        if not Validators.validate_os_code(os_code):
+        # Validasi + ambil info OS dalam satu probe dict
+        os_info = Settings.WINDOWS_OS.get(os_code)
+        if os_info is None:
             await update.message.reply_text(Messages.ERROR_INVALID_OS)
             return
-        
-        # Dapatkan informasi OS
-        os_info = Settings.WINDOWS_OS[os_code]
-        
+
+        # Tolak duplikat sebelum bikin task: satu SELECT berindeks,
+        # request invalid tidak perlu bayar scheduling + create_installation
+        if await self.install_db.has_active_install(user_id, ip):
+            await update.message.reply_text(Messages.ERROR_INSTALL_IN_PROGRESS)
+            return
+
         # Kirim pesan awal
         msg = await update.message.reply_text(Messages.INSTALL_STEP_CONNECTING.format(ip=ip))
         
@@ -96,9 +153,13 @@ class InstallHandler:
             )
         )
         
-        # Simpan task
+        # Simpan task; done-callback yang bersihkan entry, bukan finally
+        # di process_installation, jadi tidak ada entry bocor saat error
         task_id = f"{telegram_id}_{ip}"
         self.active_installations[task_id] = task
+        task.add_done_callback(
+            lambda _task, key=task_id: self.active_installations.pop(key, None)
+        )
     
     async def process_installation(
         self,
@@ -106,6 +167,26 @@ class InstallHandler:
         install_data: Dict[str, Any],
         source: str = "telegram",
         telegram_message=None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Entry point instalasi dengan batas konkurensi
+
+        Semaphore global membatasi total instalasi paralel, semaphore
+        per-host mencegah badai koneksi ke satu sshd (MaxStartups).
+        """
+        ip = install_data['ip']
+        host_sem = self._host_sems.setdefault(
+            ip, asyncio.Semaphore(Settings.MAX_CONCURRENT_INSTALLS_PER_HOST)
+        )
+        async with self._install_sem, host_sem:
+            return await self._run_installation(user_id, install_data, source, telegram_message)
+
+    async def _run_installation(
+        self,
+        user_id: int,
+        install_data: Dict[str, Any],
+        source: str = "telegram",
+        telegram_message=None
     ) -> Tuple[str, Dict[str, Any]]:
         """
         Core installation process dengan single message updates
@@ -134,7 +215,7 @@ class InstallHandler:
                 if telegram_message:
                     await self.progress_manager.send_final_message(
                         telegram_message,
-                        Messages.INSTALL_FAILED_RESULT.format(ip=ip, error=error_msg)
+                        _FAILED_RESULT(ip=ip, error=error_msg)
                     )
                 result_data['error'] = error_msg
                 return Settings.INSTALL_STATUS_FAILED, result_data
@@ -144,201 +225,155 @@ class InstallHandler:
                 user_id, install_id, ip, os_name, source
             )
             
-            # Initialize SSH Manager
-            ssh = SSHManager()
+            # Ambil koneksi SSH dari pool (reuse kalau masih hidup)
+            ssh = await self.ssh_pool.acquire(ip, vps_password)
             
             # STEP 1: CONNECTING (message already sent)
-            await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_CONNECTING)
-            await self.install_db.update_step(install_id, f"Connecting to {ip}")
+            # Sink independen dijalankan paralel, bukan berantai
+            await asyncio.gather(
+                self.install_db.update_status(install_id, Settings.INSTALL_STATUS_CONNECTING),
+                self.install_db.update_step(install_id, f"Connecting to {ip}")
+            )
             
             success, error = await ssh.connect(ip, vps_password)
             if not success:
-                # Format error message
-                error_msg = Messages.INSTALL_ERROR_CONNECTION.format(error=error)
-                
-                # Send final error message
-                if telegram_message:
-                    await self.progress_manager.send_final_message(
-                        telegram_message,
-                        Messages.INSTALL_FAILED_RESULT.format(ip=ip, error=error_msg)
-                    )
-                
-                await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_FAILED, {'error': error})
-                await self.user_db.update_install_stats(user_id, False)
-                await self.notification_service.notify_installation_failed(user_id, install_id, ip, error, source)
-                
-                result_data['error'] = error
-                return Settings.INSTALL_STATUS_FAILED, result_data
-            
-            # STEP 2: CONNECTED
-            if telegram_message:
-                await self.progress_manager.update_message(
+                return await self._fail(
+                    install_id, user_id, ip, source, error, result_data,
                     telegram_message,
-                    Messages.INSTALL_STEP_CONNECTED.format(ip=ip),
-                    delay=1.0
+                    error_msg=Messages.INSTALL_ERROR_CONNECTION.format(error=error)
                 )
             
+            # STEP 2: CONNECTED
+            # Edit progress ter-debounce: transisi beruntun digabung
+            # jadi satu editMessageText, tanpa sleep pacing manual
+            self.progress_manager.schedule_update(
+                telegram_message,
+                Messages.INSTALL_STEP_CONNECTED.format(ip=ip)
+            )
+
             # STEP 3: CHECKING SYSTEM
-            if telegram_message:
-                await self.progress_manager.update_message(
-                    telegram_message,
-                    Messages.INSTALL_STEP_CHECKING
-                )
+            self.progress_manager.schedule_update(
+                telegram_message,
+                Messages.INSTALL_STEP_CHECKING
+            )
             
-            await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_CHECKING)
-            await self.install_db.update_step(install_id, "Checking system specifications")
+            await asyncio.gather(
+                self.install_db.update_status(install_id, Settings.INSTALL_STATUS_CHECKING),
+                self.install_db.update_step(install_id, "Checking system specifications")
+            )
             
             specs = await ssh.check_system_specs(ip)
             
             # Validasi spesifikasi
             if specs['ram_mb'] < Settings.MIN_RAM_MB:
-                error_msg = Messages.INSTALL_ERROR_RAM.format(
-                    available=round(specs['ram_mb']/1024, 1),
-                    required=Settings.MIN_RAM_MB/1024
-                )
-                if telegram_message:
-                    await self.progress_manager.send_final_message(
-                        telegram_message,
-                        Messages.INSTALL_FAILED_RESULT.format(ip=ip, error=error_msg)
+                return await self._fail(
+                    install_id, user_id, ip, source, "Insufficient RAM", result_data,
+                    telegram_message,
+                    error_msg=Messages.INSTALL_ERROR_RAM.format(
+                        available=round(specs['ram_mb']/1024, 1),
+                        required=Settings.MIN_RAM_MB/1024
                     )
-                
-                await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_FAILED, {'error': "Insufficient RAM"})
-                await self.user_db.update_install_stats(user_id, False)
-                await self.notification_service.notify_installation_failed(user_id, install_id, ip, "Insufficient RAM", source)
-                
-                result_data['error'] = "Insufficient RAM"
-                return Settings.INSTALL_STATUS_FAILED, result_data
-            
-            if specs['disk_gb'] < Settings.MIN_DISK_GB:
-                error_msg = Messages.INSTALL_ERROR_DISK.format(
-                    available=specs['disk_gb'],
-                    required=Settings.MIN_DISK_GB
                 )
-                if telegram_message:
-                    await self.progress_manager.send_final_message(
-                        telegram_message,
-                        Messages.INSTALL_FAILED_RESULT.format(ip=ip, error=error_msg)
+
+            if specs['disk_gb'] < Settings.MIN_DISK_GB:
+                return await self._fail(
+                    install_id, user_id, ip, source, "Insufficient disk", result_data,
+                    telegram_message,
+                    error_msg=Messages.INSTALL_ERROR_DISK.format(
+                        available=specs['disk_gb'],
+                        required=Settings.MIN_DISK_GB
                     )
-                
-                await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_FAILED, {'error': "Insufficient disk"})
-                await self.user_db.update_install_stats(user_id, False)
-                await self.notification_service.notify_installation_failed(user_id, install_id, ip, "Insufficient disk", source)
-                
-                result_data['error'] = "Insufficient disk"
-                return Settings.INSTALL_STATUS_FAILED, result_data
-            
+                )
+
             if specs['os_type'] not in Settings.SUPPORTED_OS_TYPES:
-                error_msg = Messages.INSTALL_ERROR_OS.format(os_type=specs['os_type'])
-                if telegram_message:
-                    await self.progress_manager.send_final_message(
-                        telegram_message,
-                        Messages.INSTALL_FAILED_RESULT.format(ip=ip, error=error_msg)
-                    )
-                
-                await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_FAILED, {'error': "Unsupported OS"})
-                await self.user_db.update_install_stats(user_id, False)
-                await self.notification_service.notify_installation_failed(user_id, install_id, ip, "Unsupported OS", source)
-                
-                result_data['error'] = "Unsupported OS"
-                return Settings.INSTALL_STATUS_FAILED, result_data
+                return await self._fail(
+                    install_id, user_id, ip, source, "Unsupported OS", result_data,
+                    telegram_message,
+                    error_msg=Messages.INSTALL_ERROR_OS.format(os_type=specs['os_type'])
+                )
             
             boot_mode = specs['boot_mode']
             result_data['boot_mode'] = boot_mode
             
             # STEP 4: SYSTEM CHECK PASSED
-            if telegram_message:
-                await self.progress_manager.update_message(
-                    telegram_message,
-                    Messages.INSTALL_STEP_CHECKED,
-                    delay=1.0
-                )
-            
+            self.progress_manager.schedule_update(
+                telegram_message,
+                Messages.INSTALL_STEP_CHECKED
+            )
+
             # STEP 5: PREPARING
-            if telegram_message:
-                await self.progress_manager.update_message(
-                    telegram_message,
-                    Messages.INSTALL_STEP_PREPARING
-                )
+            self.progress_manager.schedule_update(
+                telegram_message,
+                Messages.INSTALL_STEP_PREPARING
+            )
             
-            await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_PREPARING)
-            await self.install_db.update_step(install_id, "Preparing installation")
-            await self.notification_service.notify_installation_progress(user_id, install_id, ip, "Preparing", source)
+            await asyncio.gather(
+                self.install_db.update_status(install_id, Settings.INSTALL_STATUS_PREPARING),
+                self.install_db.update_step(install_id, "Preparing installation"),
+                self.notification_service.notify_installation_progress(user_id, install_id, ip, "Preparing", source)
+            )
             
             success, error = await ssh.prepare_installation(ip)
             if not success:
-                error_msg = Messages.INSTALL_ERROR_PREPARATION.format(error=error)
-                if telegram_message:
-                    await self.progress_manager.send_final_message(
-                        telegram_message,
-                        Messages.INSTALL_FAILED_RESULT.format(ip=ip, error=error_msg)
-                    )
-                
-                await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_FAILED, {'error': error})
-                await self.user_db.update_install_stats(user_id, False)
-                await self.notification_service.notify_installation_failed(user_id, install_id, ip, error, source)
-                
-                result_data['error'] = error
-                return Settings.INSTALL_STATUS_FAILED, result_data
-            
-            # STEP 6: PREPARED
-            if telegram_message:
-                await self.progress_manager.update_message(
+                return await self._fail(
+                    install_id, user_id, ip, source, error, result_data,
                     telegram_message,
-                    Messages.INSTALL_STEP_PREPARED,
-                    delay=1.0
+                    error_msg=Messages.INSTALL_ERROR_PREPARATION.format(error=error)
                 )
             
+            # STEP 6: PREPARED
+            self.progress_manager.schedule_update(
+                telegram_message,
+                Messages.INSTALL_STEP_PREPARED
+            )
+
             # STEP 7: INSTALLING
-            if telegram_message:
-                await self.progress_manager.update_message(
-                    telegram_message,
-                    Messages.INSTALL_STEP_INSTALLING.format(ip=ip)
-                )
+            self.progress_manager.schedule_update(
+                telegram_message,
+                Messages.INSTALL_STEP_INSTALLING.format(ip=ip)
+            )
             
-            await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_INSTALLING)
-            await self.install_db.update_step(install_id, "Installing Windows")
-            await self.notification_service.notify_installation_progress(user_id, install_id, ip, "Installing Windows", source)
+            await asyncio.gather(
+                self.install_db.update_status(install_id, Settings.INSTALL_STATUS_INSTALLING),
+                self.install_db.update_step(install_id, "Installing Windows"),
+                self.notification_service.notify_installation_progress(user_id, install_id, ip, "Installing Windows", source)
+            )
             
             success, message = await ssh.start_installation(ip, os_code, rdp_password, boot_mode)
             if not success:
-                error_msg = Messages.INSTALL_ERROR_GENERIC.format(error=message)
-                if telegram_message:
-                    await self.progress_manager.send_final_message(
-                        telegram_message,
-                        Messages.INSTALL_FAILED_RESULT.format(ip=ip, error=error_msg)
-                    )
-                
-                await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_FAILED, {'error': message})
-                await self.user_db.update_install_stats(user_id, False)
-                await self.notification_service.notify_installation_failed(user_id, install_id, ip, message, source)
-                
-                result_data['error'] = message
-                return Settings.INSTALL_STATUS_FAILED, result_data
-            
-            # STEP 8: MONITORING
-            if telegram_message:
-                await self.progress_manager.update_message(
+                return await self._fail(
+                    install_id, user_id, ip, source, message, result_data,
                     telegram_message,
-                    Messages.INSTALL_STEP_MONITORING.format(ip=ip)
+                    error_msg=Messages.INSTALL_ERROR_GENERIC.format(error=message)
                 )
             
-            await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_MONITORING)
-            await self.install_db.update_step(install_id, f"Monitoring installation on port {Settings.MONITORING_PORT}")
-            await self.notification_service.notify_installation_progress(user_id, install_id, ip, "Monitoring progress", source)
+            # STEP 8: MONITORING
+            self.progress_manager.schedule_update(
+                telegram_message,
+                Messages.INSTALL_STEP_MONITORING.format(ip=ip)
+            )
+            
+            await asyncio.gather(
+                self.install_db.update_status(install_id, Settings.INSTALL_STATUS_MONITORING),
+                self.install_db.update_step(install_id, f"Monitoring installation on port {Settings.MONITORING_PORT}"),
+                self.notification_service.notify_installation_progress(user_id, install_id, ip, "Monitoring progress", source)
+            )
             
             # Wait before monitoring
             await asyncio.sleep(Settings.TIMEOUT_MONITORING_START)
             
             # Monitor installation
             installation_complete = False
-            monitoring_start = asyncio.get_event_loop().time()
-            max_monitoring_time = Settings.TIMEOUT_INSTALLATION - Settings.TIMEOUT_MONITORING_START
+            # Deadline dihitung sekali, loop cukup bandingkan monotonic clock
+            deadline = time.monotonic() + (
+                Settings.TIMEOUT_INSTALLATION - Settings.TIMEOUT_MONITORING_START
+            )
             consecutive_closed_count = 0
             required_consecutive_checks = Settings.TIMEOUT_MONITORING_CHECKS
-            
+            open_streak = 0
+
             while True:
-                current_time = asyncio.get_event_loop().time()
-                if current_time - monitoring_start > max_monitoring_time:
+                if time.monotonic() > deadline:
                     # TIMEOUT
                     if telegram_message:
                         await self.progress_manager.send_final_message(
@@ -350,9 +385,11 @@ class InstallHandler:
                             )
                         )
                     
-                    await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_TIMEOUT)
-                    await self.user_db.update_install_stats(user_id, False)
-                    await self.notification_service.notify_installation_timeout(user_id, install_id, ip, source)
+                    await asyncio.gather(
+                        self.install_db.update_status(install_id, Settings.INSTALL_STATUS_TIMEOUT),
+                        self.user_db.update_install_stats(user_id, False),
+                        self.notification_service.notify_installation_timeout(user_id, install_id, ip, source)
+                    )
                     
                     result_data['status'] = Settings.INSTALL_STATUS_TIMEOUT
                     result_data['rdp_info'] = {
@@ -363,20 +400,32 @@ class InstallHandler:
                     }
                     return Settings.INSTALL_STATUS_TIMEOUT, result_data
                 
-                # Check monitoring port
-                port_open = await ssh.check_port(ip, Settings.MONITORING_PORT, timeout=5)
-                
-                if not port_open:
+                # Probe TCP langsung, tidak perlu channel SSH untuk liveness check
+                port_closed = await self._probe_closed(ip, Settings.MONITORING_PORT)
+
+                if port_closed:
                     consecutive_closed_count += 1
-                    logger.info(f"Port {Settings.MONITORING_PORT} closed, check {consecutive_closed_count}/{required_consecutive_checks} for {ip}")
-                    
+                    open_streak = 0
+                    # Lazy %-format: string baru dibangun kalau record diterima
+                    logger.info(
+                        "Port %d closed, check %d/%d for %s",
+                        Settings.MONITORING_PORT, consecutive_closed_count,
+                        required_consecutive_checks, ip
+                    )
+
                     if consecutive_closed_count >= required_consecutive_checks:
                         installation_complete = True
                         break
+
+                    await asyncio.sleep(Settings.TIMEOUT_MONITORING_INTERVAL)
                 else:
                     consecutive_closed_count = 0
-                
-                await asyncio.sleep(Settings.TIMEOUT_MONITORING_INTERVAL)
+                    # Port masih terbuka = instalasi masih jalan, backoff
+                    # eksponensial supaya tidak spam probe selama DD berjalan
+                    await asyncio.sleep(
+                        min(Settings.TIMEOUT_MONITORING_INTERVAL * 2 ** open_streak, 30)
+                    )
+                    open_streak += 1
             
             if installation_complete:
                 # SUCCESS
@@ -397,12 +446,14 @@ class InstallHandler:
                     'password': rdp_password
                 }
                 
-                await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_COMPLETED, {
-                    'rdp_info': rdp_info,
-                    'boot_mode': boot_mode
-                })
-                await self.user_db.update_install_stats(user_id, True)
-                await self.notification_service.notify_installation_completed(user_id, install_id, ip, rdp_password, source)
+                await asyncio.gather(
+                    self.install_db.update_status(install_id, Settings.INSTALL_STATUS_COMPLETED, {
+                        'rdp_info': rdp_info,
+                        'boot_mode': boot_mode
+                    }),
+                    self.user_db.update_install_stats(user_id, True),
+                    self.notification_service.notify_installation_completed(user_id, install_id, ip, rdp_password, source)
+                )
                 
                 result_data['status'] = Settings.INSTALL_STATUS_COMPLETED
                 result_data['rdp_info'] = rdp_info
@@ -410,59 +461,70 @@ class InstallHandler:
                 
         except Exception as e:
             logger.error(f"Installation error: {e}", exc_info=True)
-            error_msg = Messages.INSTALL_ERROR_GENERIC.format(error=str(e))
-            
-            if telegram_message:
-                try:
-                    await self.progress_manager.send_final_message(
-                        telegram_message,
-                        Messages.INSTALL_FAILED_RESULT.format(ip=ip, error=str(e))
-                    )
-                except:
-                    pass
-            
-            if install_id:
-                await self.install_db.update_status(install_id, Settings.INSTALL_STATUS_FAILED, {'error': str(e)})
-            
-            await self.user_db.update_install_stats(user_id, False)
-            await self.notification_service.notify_installation_failed(user_id, install_id, ip, str(e), source)
-            
-            result_data['error'] = str(e)
-            return Settings.INSTALL_STATUS_FAILED, result_data
+            return await self._fail(
+                install_id, user_id, ip, source, str(e), result_data, telegram_message
+            )
             
         finally:
             if ssh:
-                await ssh.cleanup()
-            
-            # Remove task from active installations if from Telegram
-            if source == "telegram" and telegram_message:
-                try:
-                    telegram_id = telegram_message.chat_id
-                    task_id = f"{telegram_id}_{ip}"
-                    if task_id in self.active_installations:
-                        del self.active_installations[task_id]
-                except:
-                    pass
+                # Kembalikan ke pool, koneksi hidup dipakai ulang install berikutnya
+                await self.ssh_pool.release(ip, vps_password, ssh)
     
+    async def _fail(
+        self,
+        install_id: Optional[str],
+        user_id: int,
+        ip: str,
+        source: str,
+        error: str,
+        result_data: Dict[str, Any],
+        telegram_message=None,
+        error_msg: Optional[str] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Jalur gagal terpusat untuk semua branch di _run_installation
+
+        Satu UPDATE status, stats ter-buffer (flush batch), dan
+        notifikasi dikirim fire-and-forget supaya handler tidak
+        menunggu network I/O Telegram.
+        """
+        if telegram_message:
+            await self.progress_manager.send_final_message(
+                telegram_message,
+                _FAILED_RESULT(ip=ip, error=error_msg or error)
+            )
+
+        if install_id:
+            await self.install_db.update_status(
+                install_id, Settings.INSTALL_STATUS_FAILED, {'error': error}
+            )
+        await self.user_db.update_install_stats(user_id, False)
+        asyncio.create_task(
+            self.notification_service.notify_installation_failed(
+                user_id, install_id, ip, error, source
+            )
+        )
+
+        result_data['error'] = error
+        return Settings.INSTALL_STATUS_FAILED, result_data
+
+    @staticmethod
+    async def _probe_closed(ip: str, port: int, timeout: int = 5) -> bool:
+        """Cek apakah port sudah tertutup via koneksi TCP langsung"""
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(ip, port),
+                timeout=timeout
+            )
+            writer.close()
+            await writer.wait_closed()
+            return False
+        except (OSError, asyncio.TimeoutError):
+            return True
+
     @handle_errors
     async def oslist(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handler untuk command /oslist"""
-        servers = []
-        desktops = []
-        
-        for code, info in Settings.WINDOWS_OS.items():
-            line = f"{code} - {info['name']}"
-            if info.get('category') == 'server':
-                servers.append(line)
-            else:
-                desktops.append(line)
-        
-        message = Messages.OS_LIST.format(
-            servers='\n'.join([f"- {s}" for s in servers]),
-            desktops='\n'.join([f"- {d}" for d in desktops])
-        )
-        
-        await update.message.reply_text(message)
+        await update.message.reply_text(self._oslist_message)
     
     @handle_errors
     @require_login
@@ -488,23 +550,7 @@ class InstallHandler:
             await update.message.reply_text(Messages.NO_INSTALLATION_HISTORY)
             return
         
-        message_lines = [Messages.INSTALLATION_HISTORY_HEADER]
-        
-        for install in installations[:10]:
-            status_text = {
-                Settings.INSTALL_STATUS_COMPLETED: "[COMPLETED]",
-                Settings.INSTALL_STATUS_FAILED: "[FAILED]", 
-                Settings.INSTALL_STATUS_TIMEOUT: "[TIMEOUT]"
-            }.get(install['status'], "[IN PROGRESS]")
-            
-            date = install['start_time'][:10] if install['start_time'] else 'Unknown'
-            message_lines.append(f"{status_text} {install['os_name']}")
-            message_lines.append(f"   IP: {install['ip']}")
-            message_lines.append(f"   Date: {date}")
-            
-            if install['status'] == Settings.INSTALL_STATUS_COMPLETED and install.get('rdp_info'):
-                message_lines.append(f"   RDP Port: {Settings.RDP_PORT}")
-            
-            message_lines.append("")
-        
-        await update.message.reply_text('\n'.join(message_lines))
\ No newline at end of file
+        rows = [_format_history_row(install) for install in installations[:10]]
+        await update.message.reply_text(
+            Messages.INSTALLATION_HISTORY_HEADER + '\n' + '\n\n'.join(rows)
+        )
\ No newline at end of file
@@ -4,7 +4,6 @@ Menangani menu utama, help, dan profile user
 """
 
 import logging
-from datetime import datetime
 from telegram import Update
 from telegram.ext import ContextTypes
 
@@ -70,22 +69,12 @@ class MenuHandler:
         
         username, data = user_data
         
-        # Format tanggal
-        created = data.get('created_at', 'Unknown')
-        if created != 'Unknown':
-            try:
-                created_date = datetime.fromisoformat(created)
-                created = created_date.strftime('%Y-%m-%d')
-            except:
-                pass
-        
-        last_login = data.get('last_login', 'Never')
-        if last_login != 'Never':
-            try:
-                login_date = datetime.fromisoformat(last_login)
-                last_login = login_date.strftime('%Y-%m-%d %H:%M')
-            except:
-                pass
+        # Format tanggal (row membawa datetime langsung dari database)
+        created = data.get('created_at')
+        created = created.strftime('%Y-%m-%d') if created else 'Unknown'
+
+        last_login = data.get('last_login')
+        last_login = last_login.strftime('%Y-%m-%d %H:%M') if last_login else 'Never'
         
         # Hitung success rate
         total = data.get('total_installs', 0)
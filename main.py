@@ -4,23 +4,15 @@ Bot Telegram untuk instalasi Windows otomatis ke VPS
 """
 
 import logging
+import logging.handlers
 import asyncio
+import queue
 import sys
 import signal
 from pathlib import Path
 
-# Import nest_asyncio untuk fix event loop issues
-try:
-    import nest_asyncio
-    nest_asyncio.apply()
-except ImportError:
-    import subprocess
-    subprocess.run([sys.executable, "-m", "pip", "install", "nest_asyncio"], capture_output=True)
-    import nest_asyncio
-    nest_asyncio.apply()
-
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from telegram.ext import Application, AIORateLimiter, CommandHandler, MessageHandler, filters
 
 from config.settings import Settings, validate_environment
 from database.connection import init_database, close_database, db_manager
@@ -33,16 +25,26 @@ from handlers.admin import AdminHandler
 from utils.messages import Messages
 from utils.helpers import NotificationService
 
-# Konfigurasi logging
+# Konfigurasi logging lewat queue: handler di event loop cuma enqueue
+# in-memory, listener thread yang menulis ke file + stderr
+_log_queue = queue.SimpleQueue()
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+_file_handler = logging.FileHandler(Settings.LOG_FILE)
+_file_handler.setFormatter(_log_formatter)
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(_log_formatter)
+
 logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=getattr(logging, Settings.LOG_LEVEL, logging.INFO),
-    handlers=[
-        logging.FileHandler(Settings.LOG_FILE),
-        logging.StreamHandler()
-    ]
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 
+_log_listener = logging.handlers.QueueListener(
+    _log_queue, _file_handler, _stream_handler, respect_handler_level=True
+)
+_log_listener.start()
+
 # Suppress noise dari HTTP libraries
 logging.getLogger('httpcore').setLevel(logging.WARNING)
 logging.getLogger('httpx').setLevel(logging.WARNING)
@@ -50,10 +52,50 @@ logging.getLogger('aiomysql').setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Filter gabungan dibangun sekali, dievaluasi di setiap update
+_CMD = filters.COMMAND
+_TEXT_NO_CMD = filters.TEXT & ~filters.COMMAND
+
+# Pesan hot-path di-bind ke nama modul, skip lookup atribut per update
+_MSG_UNKNOWN = Messages.UNKNOWN_COMMAND
+_MSG_NOT_LOGGED_IN = Messages.NOT_LOGGED_IN
+_MSG_USE_MENU = Messages.USE_MENU
+_MSG_ERROR = Messages.ERROR_GENERIC
+
 
 class WindowsInstallerBot:
     """Bot utama untuk instalasi Windows"""
-    
+
+    # Tabel registrasi command: (command, handler attr, method, block)
+    # block=False untuk command I/O panjang supaya PTB spawn task sendiri
+    COMMANDS = (
+        # Auth commands
+        ('start', 'auth_handler', 'start', True),
+        ('login', 'auth_handler', 'login', True),
+        ('register', 'auth_handler', 'register', True),
+        ('logout', 'auth_handler', 'logout', True),
+        # Install commands
+        ('install', 'install_handler', 'install', False),
+        ('oslist', 'install_handler', 'oslist', True),
+        ('history', 'install_handler', 'history', True),
+        # Menu commands
+        ('menu', 'menu_handler', 'menu', True),
+        ('help', 'menu_handler', 'help', True),
+        ('profile', 'menu_handler', 'profile', True),
+        # Admin commands
+        ('adminpanel', 'admin_handler', 'adminpanel', True),
+        ('userlist', 'admin_handler', 'userlist', True),
+        ('adduser', 'admin_handler', 'adduser', True),
+        ('deleteuser', 'admin_handler', 'deleteuser', True),
+        ('banuser', 'admin_handler', 'banuser', True),
+        ('unbanuser', 'admin_handler', 'unbanuser', True),
+        ('broadcast', 'admin_handler', 'broadcast', False),
+        ('cleanup', 'admin_handler', 'cleanup', False),
+        ('dbstatus', 'admin_handler', 'dbstatus', True),
+        ('dbstats', 'admin_handler', 'dbstats', True),
+        ('logs', 'admin_handler', 'logs', True),
+    )
+
     def __init__(self):
         # Validasi konfigurasi
         if not validate_environment():
@@ -72,16 +114,29 @@ class WindowsInstallerBot:
         # Notification service
         self.notification_service = None
         
-        # Create bot application
-        self.app = Application.builder().token(Settings.BOT_TOKEN).build()
+        # Create bot application; concurrent_updates supaya handler
+        # lambat (mis. /install) tidak memblokir update user lain,
+        # rate limiter supaya broadcast antri di 30 msg/s, bukan kena 429
+        self.app = (
+            Application.builder()
+            .token(Settings.BOT_TOKEN)
+            .concurrent_updates(Settings.CONCURRENT_UPDATES)
+            .rate_limiter(AIORateLimiter(overall_max_rate=30, overall_time_period=1, max_retries=3))
+            .build()
+        )
         
         # Status flags
         self.is_initialized = False
         self.is_running = False
+
+        # Background task periodic cleanup
+        self._cleanup_task = None
         
-        logger.info(f"Bot initialized: {Settings.BOT_NAME} v{Settings.BOT_VERSION}")
-        logger.info(f"Environment: {Settings.ENVIRONMENT}")
-        logger.info(f"MySQL Host: {Settings.DB_CONFIG['host']}:{Settings.DB_CONFIG['port']}")
+        logger.info(
+            f"Bot initialized: {Settings.BOT_NAME} v{Settings.BOT_VERSION}\n"
+            f"Environment: {Settings.ENVIRONMENT}\n"
+            f"MySQL Host: {Settings.DB_CONFIG['host']}:{Settings.DB_CONFIG['port']}"
+        )
     
     async def initialize_database(self) -> bool:
         """Inisialisasi koneksi database"""
@@ -92,18 +147,24 @@ class WindowsInstallerBot:
             success = await init_database()
             if not success:
                 logger.error("Failed to connect to database")
+                print("Error: Cannot connect to MySQL database")
+                print(f"Host: {Settings.DB_CONFIG['host']}:{Settings.DB_CONFIG['port']}")
+                print(f"Database: {Settings.DB_CONFIG['database']}")
+                print(f"User: {Settings.DB_CONFIG['user']}")
                 return False
             
-            # Initialize database managers
+            # Initialize database managers, paralel karena independen
             self.user_db = UserDatabase()
-            await self.user_db.initialize()
-            
             self.install_db = InstallationDatabase()
-            await self.install_db.initialize()
+            await asyncio.gather(
+                self.user_db.initialize(),
+                self.install_db.initialize()
+            )
             
             # Log database status
             db_status = await db_manager.get_connection_status()
-            logger.info(f"Database connection pool: {db_status}")
+            logger.info(f"Database connection pool: {db_status} "
+                        f"(sized for {Settings.CONCURRENT_UPDATES} concurrent updates)")
             
             logger.info("Database connected successfully")
             return True
@@ -137,55 +198,39 @@ class WindowsInstallerBot:
         if not all([self.auth_handler, self.install_handler, self.menu_handler, self.admin_handler]):
             raise RuntimeError("Handlers not initialized")
         
-        # Auth commands
-        self.app.add_handler(CommandHandler('start', self.auth_handler.start))
-        self.app.add_handler(CommandHandler('login', self.auth_handler.login))
-        self.app.add_handler(CommandHandler('register', self.auth_handler.register))
-        self.app.add_handler(CommandHandler('logout', self.auth_handler.logout))
-        
-        # Install commands
-        self.app.add_handler(CommandHandler('install', self.install_handler.install))
-        self.app.add_handler(CommandHandler('oslist', self.install_handler.oslist))
-        self.app.add_handler(CommandHandler('history', self.install_handler.history))
-        
-        # Menu commands
-        self.app.add_handler(CommandHandler('menu', self.menu_handler.menu))
-        self.app.add_handler(CommandHandler('help', self.menu_handler.help))
-        self.app.add_handler(CommandHandler('profile', self.menu_handler.profile))
-        
-        # Admin commands
-        self.app.add_handler(CommandHandler('adminpanel', self.admin_handler.adminpanel))
-        self.app.add_handler(CommandHandler('userlist', self.admin_handler.userlist))
-        self.app.add_handler(CommandHandler('adduser', self.admin_handler.adduser))
-        self.app.add_handler(CommandHandler('deleteuser', self.admin_handler.deleteuser))
-        self.app.add_handler(CommandHandler('banuser', self.admin_handler.banuser))
-        self.app.add_handler(CommandHandler('unbanuser', self.admin_handler.unbanuser))
-        self.app.add_handler(CommandHandler('broadcast', self.admin_handler.broadcast))
-        self.app.add_handler(CommandHandler('cleanup', self.admin_handler.cleanup))
-        self.app.add_handler(CommandHandler('dbstatus', self.admin_handler.dbstatus))
-        self.app.add_handler(CommandHandler('dbstats', self.admin_handler.dbstats))
-        self.app.add_handler(CommandHandler('logs', self.admin_handler.logs))
-        
+        # Registrasi command dari tabel COMMANDS
+        for command, handler_attr, method, block in self.COMMANDS:
+            callback = getattr(getattr(self, handler_attr), method)
+            self.app.add_handler(CommandHandler(command, callback, block=block))
+
+
         # Error and unknown command handlers
         self.app.add_error_handler(self.error_handler)
-        self.app.add_handler(MessageHandler(filters.COMMAND, self.unknown_command))
-        self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text))
+        self.app.add_handler(MessageHandler(_CMD, self.unknown_command))
+        self.app.add_handler(MessageHandler(_TEXT_NO_CMD, self.handle_text))
         
         logger.info("All handlers registered")
     
     async def error_handler(self, update: Update, context):
         """Handler untuk error"""
         logger.error(f"Update {update} caused error {context.error}", exc_info=True)
-        
+
+        # Balasan error fire-and-forget: kalau Telegram sendiri yang
+        # bermasalah, await di sini cuma memperpanjang stall
+        if update and update.effective_message:
+            asyncio.create_task(self._reply_error(update.effective_message))
+
+    @staticmethod
+    async def _reply_error(message):
+        """Kirim pesan error generik tanpa menahan error_handler"""
         try:
-            if update and update.effective_message:
-                await update.effective_message.reply_text(Messages.ERROR_GENERIC)
+            await message.reply_text(_MSG_ERROR)
         except Exception as e:
             logger.error(f"Failed to send error message: {e}")
     
     async def unknown_command(self, update: Update, context):
         """Handler untuk command yang tidak dikenali"""
-        await update.message.reply_text(Messages.UNKNOWN_COMMAND)
+        await update.message.reply_text(_MSG_UNKNOWN)
     
     async def handle_text(self, update: Update, context):
         """Handler untuk pesan teks biasa"""
@@ -193,27 +238,25 @@ class WindowsInstallerBot:
         
         # Check if user is logged in
         if not await self.user_db.check_session(user_id):
-            await update.message.reply_text(Messages.NOT_LOGGED_IN)
+            await update.message.reply_text(_MSG_NOT_LOGGED_IN)
         else:
-            await update.message.reply_text(Messages.USE_MENU)
+            await update.message.reply_text(_MSG_USE_MENU)
     
     async def startup_tasks(self):
         """Tasks yang dijalankan saat startup"""
         try:
             logger.info("Running startup tasks...")
             
-            # Cleanup stuck installations
+            # Cleanup stuck installations, paralel
             if self.install_db:
-                await self.install_db.cleanup_stuck_installations()
-                await self.install_db.cleanup_old_installations(days=Settings.CLEANUP_OLD_INSTALLS_DAYS)
-                
-                # Log database status
-                try:
-                    db_info = await db_manager.get_database_info()
-                    logger.info(f"Database contains: Users: {db_info.get('record_counts', {}).get('users', 0)}, "
-                              f"Installations: {db_info.get('record_counts', {}).get('installations', 0)}")
-                except Exception as e:
-                    logger.warning(f"Could not get database status: {e}")
+                await asyncio.gather(
+                    self.install_db.cleanup_stuck_installations(),
+                    self.install_db.cleanup_old_installations(days=Settings.CLEANUP_OLD_INSTALLS_DAYS)
+                )
+
+                # Scan information_schema bisa lambat; log di background,
+                # polling tidak perlu menunggu
+                asyncio.create_task(self._log_db_info())
             
             logger.info("Startup tasks completed - Bot ready")
             
@@ -221,10 +264,25 @@ class WindowsInstallerBot:
             logger.error(f"Startup error: {e}")
             raise
     
+    async def _log_db_info(self):
+        """Log ringkasan isi database tanpa menahan startup"""
+        try:
+            db_info = await db_manager.get_database_info()
+            logger.info(f"Database contains: Users: {db_info.get('record_counts', {}).get('users', 0)}, "
+                        f"Installations: {db_info.get('record_counts', {}).get('installations', 0)}")
+        except Exception as e:
+            logger.warning(f"Could not get database status: {e}")
+
     async def shutdown_tasks(self):
         """Tasks yang dijalankan saat shutdown"""
         try:
             logger.info("Running shutdown tasks...")
+
+            if self._cleanup_task is not None:
+                self._cleanup_task.cancel()
+                await asyncio.gather(self._cleanup_task, return_exceptions=True)
+                self._cleanup_task = None
+
             await close_database()
             logger.info("Shutdown tasks completed")
             
@@ -253,7 +311,14 @@ class WindowsInstallerBot:
             
         except Exception as e:
             logger.error(f"Periodic cleanup error: {e}")
-    
+
+    async def _cleanup_loop(self):
+        """Background task untuk periodic cleanup (tiap 6 jam)"""
+        await asyncio.sleep(3600)  # Mulai setelah 1 jam
+        while True:
+            await self.periodic_cleanup()
+            await asyncio.sleep(21600)  # 6 jam
+
     async def initialize_bot_async(self):
         """Inisialisasi bot secara async"""
         try:
@@ -272,9 +337,14 @@ class WindowsInstallerBot:
             
             # Run startup tasks
             await self.startup_tasks()
-            
+
             # Set initialized flag
             self.is_initialized = True
+
+            # Jalankan periodic cleanup sebagai task milik sendiri;
+            # error-nya ke-log dari periodic_cleanup, bukan hilang diam
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+            logger.info("Periodic cleanup scheduled")
             
             logger.info("Bot initialization successful")
             return True
@@ -283,174 +353,154 @@ class WindowsInstallerBot:
             logger.error(f"Initialization error: {e}")
             return False
     
-    def run(self):
-        """Menjalankan bot"""
-        async def run_bot():
-            """Main bot runner function"""
+    async def run_async(self):
+        """Menjalankan bot di event loop yang sudah berjalan"""
+        try:
+            # Signal handler berbasis event loop: set event sekali,
+            # tidak ada loop polling flag tiap detik
+            stop_event = asyncio.Event()
+
+            def _request_stop(signum):
+                logger.info(f"Received signal {signum}, stopping bot...")
+                self.is_running = False
+                stop_event.set()
+
+            loop = asyncio.get_running_loop()
             try:
-                # Setup signal handlers
-                def signal_handler(signum, frame):
-                    logger.info(f"Received signal {signum}, stopping bot...")
-                    self.is_running = False
-                
-                signal.signal(signal.SIGINT, signal_handler)
-                signal.signal(signal.SIGTERM, signal_handler)
-                
-                # Initialize bot
-                success = await self.initialize_bot_async()
-                if not success:
-                    logger.error("Bot initialization failed")
-                    return False
-                
-                # Setup periodic cleanup
-                try:
-                    if hasattr(self.app, 'job_queue') and self.app.job_queue:
-                        self.app.job_queue.run_repeating(
-                            callback=lambda context: asyncio.create_task(self.periodic_cleanup()),
-                            interval=21600,  # 6 hours
-                            first=3600       # Start after 1 hour
-                        )
-                        logger.info("Periodic cleanup scheduled")
-                except Exception as e:
-                    logger.warning(f"JobQueue setup failed (not critical): {e}")
-                
-                # Display startup info
-                print(f"\n{Settings.BOT_NAME} v{Settings.BOT_VERSION}")
-                print(f"Environment: {Settings.ENVIRONMENT}")
-                print(f"MySQL: {Settings.DB_CONFIG['host']}:{Settings.DB_CONFIG['port']}")
-                print("Bot is running...")
-                print("Press Ctrl+C to stop\n")
-                
-                self.is_running = True
-                
-                # Initialize and start application
-                await self.app.initialize()
-                await self.app.start()
-                
-                logger.info("Bot started successfully, beginning polling...")
-                
-                # Start polling
+                for sig in (signal.SIGINT, signal.SIGTERM):
+                    loop.add_signal_handler(sig, _request_stop, sig)
+            except NotImplementedError:
+                # Fallback untuk platform tanpa add_signal_handler
+                for sig in (signal.SIGINT, signal.SIGTERM):
+                    signal.signal(sig, lambda signum, frame: _request_stop(signum))
+
+            # Initialize bot
+            success = await self.initialize_bot_async()
+            if not success:
+                logger.error("Bot initialization failed")
+                return False
+
+            # Display startup info: satu write atomik, bukan 5 print
+            sys.stdout.write(
+                f"\n{Settings.BOT_NAME} v{Settings.BOT_VERSION}\n"
+                f"Environment: {Settings.ENVIRONMENT}\n"
+                f"MySQL: {Settings.DB_CONFIG['host']}:{Settings.DB_CONFIG['port']}\n"
+                "Bot is running...\n"
+                "Press Ctrl+C to stop\n\n"
+            )
+            sys.stdout.flush()
+
+            self.is_running = True
+
+            # Initialize and start application
+            await self.app.initialize()
+            await self.app.start()
+
+            logger.info("Bot started successfully, beginning polling...")
+
+            # Start polling
+            try:
+                # Tanpa poll_interval: long-poll server-side yang menunggu,
+                # bukan jeda 1 detik di sisi bot
+                await self.app.updater.start_polling(
+                    drop_pending_updates=True,
+                    allowed_updates=Update.ALL_TYPES,
+                    timeout=30
+                )
+
+                # Tunggu sinyal stop tanpa wakeup periodik
+                await stop_event.wait()
+
+            except Exception as e:
+                logger.error(f"Polling error: {e}")
+                raise
+
+            finally:
+                # Cleanup
+                logger.info("Stopping bot...")
+
                 try:
-                    await self.app.updater.start_polling(
-                        drop_pending_updates=True,
-                        allowed_updates=Update.ALL_TYPES,
-                        poll_interval=1.0
-                    )
-                    
-                    # Keep running until signal received
-                    while self.is_running:
-                        await asyncio.sleep(1)
-                    
+                    if self.app.updater.running:
+                        await self.app.updater.stop()
+                    if self.app.running:
+                        await self.app.stop()
+                    await self.app.shutdown()
                 except Exception as e:
-                    logger.error(f"Polling error: {e}")
-                    raise
-                
-                finally:
-                    # Cleanup
-                    logger.info("Stopping bot...")
-                    
-                    try:
-                        if self.app.updater.running:
-                            await self.app.updater.stop()
-                        if self.app.running:
-                            await self.app.stop()
-                        await self.app.shutdown()
-                    except Exception as e:
-                        logger.error(f"App shutdown error: {e}")
-                    
-                    # Cleanup database
-                    await self.shutdown_tasks()
-                
-                return True
-                
-            except Exception as e:
-                logger.error(f"Run bot error: {e}")
-                return False
-        
-        # Main execution
-        try:
-            logger.info("Starting bot...")
-            result = asyncio.run(run_bot())
-            
-            if result:
-                logger.info("Bot stopped successfully")
-                return True
-            else:
-                logger.error("Bot failed to run")
-                return False
-                
-        except KeyboardInterrupt:
-            logger.info("Bot stopped by user")
-            print("\nBot stopped.")
+                    logger.error(f"App shutdown error: {e}")
+
+                # Cleanup database
+                await self.shutdown_tasks()
+
             return True
+
         except Exception as e:
-            logger.critical(f"Fatal error: {e}")
-            print(f"Error: {e}")
+            logger.error(f"Run bot error: {e}")
             return False
 
 
 async def check_prerequisites():
-    """Cek prasyarat sebelum menjalankan bot"""
+    """Cek prasyarat sebelum menjalankan bot
+
+    Konektivitas database tidak dites di sini: initialize_database
+    sudah connect saat startup, tes terpisah cuma menambah satu siklus
+    warm-up pool + handshake yang langsung dibuang.
+    """
     try:
         # Validate environment
         if not validate_environment():
             print("Error: Invalid environment configuration")
             print("Check your .env file")
             return False
-        
-        # Test database connection
-        logger.info("Testing database connection...")
-        success = await init_database()
-        if not success:
-            print("Error: Cannot connect to MySQL database")
-            print(f"Host: {Settings.DB_CONFIG['host']}:{Settings.DB_CONFIG['port']}")
-            print(f"Database: {Settings.DB_CONFIG['database']}")
-            print(f"User: {Settings.DB_CONFIG['user']}")
-            return False
-        
-        # Close test connection
-        await close_database()
-        
+
         logger.info("Prerequisites check passed")
         return True
-        
+
     except Exception as e:
         logger.error(f"Prerequisites check failed: {e}")
         print(f"Error: {e}")
         return False
 
 
+async def main_async():
+    """Jalankan prasyarat + bot dalam satu event loop"""
+    # Check prerequisites
+    print("Checking prerequisites...")
+    if not await check_prerequisites():
+        print("Prerequisites check failed. Bot cannot start.")
+        return 1
+
+    print("Prerequisites OK, starting bot...\n")
+
+    # Create and run bot
+    bot = WindowsInstallerBot()
+    success = await bot.run_async()
+
+    if success:
+        logger.info("Bot stopped successfully")
+        return 0
+    else:
+        logger.error("Bot failed to run")
+        return 1
+
+
 def main():
     """Entry point utama"""
     try:
-        # Check prerequisites
-        print("Checking prerequisites...")
-        if not asyncio.run(check_prerequisites()):
-            print("Prerequisites check failed. Bot cannot start.")
-            return 1
-        
-        print("Prerequisites OK, starting bot...\n")
-        
-        # Create and run bot
-        bot = WindowsInstallerBot()
-        
-        # Run bot
-        success = bot.run()
-        
-        if success:
-            return 0
-        else:
-            return 1
-        
+        logger.info("Starting bot...")
+        return asyncio.run(main_async())
+
     except KeyboardInterrupt:
-        logger.info("Bot startup cancelled by user")
-        print("Bot startup cancelled.")
-        return 1
+        logger.info("Bot stopped by user")
+        print("\nBot stopped.")
+        return 0
     except Exception as e:
         logger.critical(f"Failed to start bot: {e}")
         print(f"Error: {e}")
         print("Check your MySQL database configuration")
         return 1
+    finally:
+        # Flush log yang masih antri sebelum exit
+        _log_listener.stop()
 
 
 if __name__ == "__main__":
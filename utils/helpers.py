@@ -3,16 +3,23 @@ Helper functions, decorators, validators, dan notification service
 Konsolidasi semua utility functions
 """
 
+from __future__ import annotations
+
 import logging
 import re
+import socket
+import time
 import asyncio
-from functools import wraps
-from typing import Optional, Dict, Any
-from telegram import Update, Bot
-from telegram.ext import ContextTypes
+from functools import lru_cache
+from typing import Optional, Dict, Any, TYPE_CHECKING
 from telegram.error import TelegramError
 
+if TYPE_CHECKING:
+    from telegram import Update, Bot
+    from telegram.ext import ContextTypes
+
 from config.settings import Settings
+from database.users import begin_request_cache
 from utils.messages import Messages
 
 logger = logging.getLogger(__name__)
@@ -20,58 +27,79 @@ logger = logging.getLogger(__name__)
 
 # === DECORATORS === #
 
-def handle_errors(func):
-    """Decorator untuk handle error secara konsisten"""
-    @wraps(func)
-    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        try:
-            return await func(self, update, context)
-        except Exception as e:
-            logger.error(f"Error in {func.__name__}: {e}", exc_info=True)
-            try:
-                await update.message.reply_text(Messages.ERROR_GENERIC)
-            except Exception as reply_error:
-                logger.error(f"Failed to send error message: {reply_error}")
-    return wrapper
-
-
-def require_login(func):
-    """Decorator untuk memastikan user sudah login"""
-    @wraps(func)
-    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_id = update.effective_user.id
-        if not await self.user_db.check_session(user_id):
-            await update.message.reply_text(Messages.NOT_LOGGED_IN)
-            return
-        return await func(self, update, context)
-    return wrapper
+class Guard:
+    """Decorator terparametrisasi untuk guard handler (login/admin/error)
+
+    Pengganti empat closure @wraps terpisah: flag dievaluasi sekali saat
+    dekorasi, jadi setiap update hanya lewat satu wrapper frame dengan
+    cabang boolean lokal, bukan tumpukan closure.
+    """
+
+    __slots__ = ('login', 'no_login', 'admin', 'catch')
+
+    def __init__(self, *, login: bool = False, no_login: bool = False,
+                 admin: bool = False, catch: bool = False):
+        self.login = login
+        self.no_login = no_login
+        self.admin = admin
+        self.catch = catch
+
+    def __call__(self, func):
+        # Ikat ke variabel lokal supaya wrapper tidak lookup atribut per update
+        login, no_login = self.login, self.no_login
+        admin, catch = self.admin, self.catch
+        name = func.__name__
+
+        async def wrapper(handler, update: Update, context: ContextTypes.DEFAULT_TYPE):
+            if login or no_login or admin:
+                user_id = update.effective_user.id
+                if admin:
+                    # Kedua flag independen; ambil paralel (keduanya sudah
+                    # di-cache di UserDatabase)
+                    logged_in, is_admin = await asyncio.gather(
+                        handler.user_db.check_session(user_id),
+                        handler.user_db.is_admin(user_id),
+                    )
+                    if not logged_in:
+                        await update.message.reply_text(Messages.NOT_LOGGED_IN)
+                        return
+                    if not is_admin:
+                        await update.message.reply_text(Messages.ADMIN_ONLY)
+                        return
+                elif login:
+                    if not await handler.user_db.check_session(user_id):
+                        await update.message.reply_text(Messages.NOT_LOGGED_IN)
+                        return
+                else:
+                    if await handler.user_db.check_session(user_id):
+                        await update.message.reply_text(Messages.ALREADY_LOGGED_IN)
+                        return
+
+            if not catch:
+                return await func(handler, update, context)
 
+            try:
+                # Scope memoization user-lookup untuk update ini
+                begin_request_cache()
+                return await func(handler, update, context)
+            except Exception as e:
+                logger.error(f"Error in {name}: {e}", exc_info=True)
+                try:
+                    await update.message.reply_text(Messages.ERROR_GENERIC)
+                except Exception as reply_error:
+                    logger.error(f"Failed to send error message: {reply_error}")
 
-def require_not_logged_in(func):
-    """Decorator untuk memastikan user belum login"""
-    @wraps(func)
-    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_id = update.effective_user.id
-        if await self.user_db.check_session(user_id):
-            await update.message.reply_text(Messages.ALREADY_LOGGED_IN)
-            return
-        return await func(self, update, context)
-    return wrapper
+        # Versi ringan dari functools.wraps: cukup untuk logging & introspeksi
+        wrapper.__name__ = name
+        wrapper.__qualname__ = func.__qualname__
+        wrapper.__wrapped__ = func
+        return wrapper
 
 
-def require_admin(func):
-    """Decorator untuk memastikan user adalah admin"""
-    @wraps(func)
-    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_id = update.effective_user.id
-        if not await self.user_db.check_session(user_id):
-            await update.message.reply_text(Messages.NOT_LOGGED_IN)
-            return
-        if not await self.user_db.is_admin(user_id):
-            await update.message.reply_text(Messages.ADMIN_ONLY)
-            return
-        return await func(self, update, context)
-    return wrapper
+handle_errors = Guard(catch=True)
+require_login = Guard(login=True)
+require_not_logged_in = Guard(no_login=True)
+require_admin = Guard(admin=True)
 
 
 # === VALIDATORS === #
@@ -81,22 +109,30 @@ class Validators:
     
     @staticmethod
     def validate_ip(ip: str) -> bool:
-        """Validasi format IP address"""
-        pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-        if not re.match(pattern, ip):
+        """Validasi format IP address (satu call C, strict dotted-quad)"""
+        try:
+            socket.inet_pton(socket.AF_INET, ip)
+            return True
+        except OSError:
             return False
-        octets = [int(o) for o in ip.split('.')]
-        return all(0 <= o <= 255 for o in octets)
     
     @staticmethod
     def validate_rdp_password(password: str) -> bool:
         """Validasi password RDP (min 8 char, upper, lower, number)"""
         if len(password) < Settings.MIN_RDP_PASSWORD_LENGTH:
             return False
-        has_upper = any(c.isupper() for c in password)
-        has_lower = any(c.islower() for c in password)
-        has_digit = any(c.isdigit() for c in password)
-        return has_upper and has_lower and has_digit
+        # Satu pass dengan early-exit, bukan tiga generator any()
+        has_upper = has_lower = has_digit = False
+        for c in password:
+            if not has_upper and c.isupper():
+                has_upper = True
+            elif not has_lower and c.islower():
+                has_lower = True
+            elif not has_digit and c.isdigit():
+                has_digit = True
+            if has_upper and has_lower and has_digit:
+                return True
+        return False
     
     @staticmethod
     def validate_username(username: str) -> bool:
@@ -120,11 +156,59 @@ class Validators:
 # === INSTALLATION PROGRESS MANAGER === #
 
 class InstallationProgressManager:
-    """Manager untuk handle installation progress messages"""
-    
+    """Manager untuk handle installation progress messages
+
+    Edit progress di-debounce: transisi status beruntun dalam jendela
+    DEBOUNCE_SECONDS digabung jadi satu editMessageText, jadi tidak
+    membentur rate limit Telegram dan tidak menahan flow instalasi.
+    """
+
+    DEBOUNCE_SECONDS = 0.3
+
+    def __init__(self):
+        self._pending: Dict[int, str] = {}
+        self._flush_tasks: Dict[int, asyncio.Task] = {}
+        # Teks terakhir yang benar-benar terkirim per message_id;
+        # message.text tidak berubah setelah edit_text jadi tidak bisa dipakai
+        self._last_sent: Dict[int, str] = {}
+
+    def schedule_update(self, message, text: str) -> None:
+        """Jadwalkan edit ter-debounce (hanya teks terakhir yang dikirim)"""
+        if message is None:
+            return
+
+        key = message.message_id
+        self._pending[key] = text
+        if key not in self._flush_tasks:
+            self._flush_tasks[key] = asyncio.create_task(
+                self._flush_after(message, key)
+            )
+
+    async def _flush_after(self, message, key: int) -> None:
+        """Tunggu jendela debounce lalu kirim teks pending terbaru"""
+        try:
+            await asyncio.sleep(self.DEBOUNCE_SECONDS)
+            text = self._pending.pop(key, None)
+            if text is not None and text != self._last_sent.get(key):
+                if await self.update_message(message, text):
+                    self._last_sent[key] = text
+        finally:
+            self._flush_tasks.pop(key, None)
+
+    def _discard_pending(self, message) -> None:
+        """Buang edit pending untuk message (dipanggil sebelum pesan final)"""
+        if message is None:
+            return
+        key = message.message_id
+        self._pending.pop(key, None)
+        self._last_sent.pop(key, None)
+        task = self._flush_tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+
     @staticmethod
-    async def update_message(message, text: str, delay: float = 0.3):
-        """Update message dengan delay untuk smooth transition"""
+    async def update_message(message, text: str, delay: float = 0.0):
+        """Update message; delay opsional murni untuk smoothing visual"""
         try:
             if message and message.text != text:
                 await message.edit_text(text)
@@ -136,9 +220,9 @@ class InstallationProgressManager:
             logger.debug(f"Could not update message: {e}")
             return False
     
-    @staticmethod
-    async def send_final_message(message, text: str, delete_previous: bool = True):
+    async def send_final_message(self, message, text: str, delete_previous: bool = True):
         """Send final message dan hapus yang lama"""
+        self._discard_pending(message)
         try:
             if delete_previous and message:
                 try:
@@ -157,42 +241,82 @@ class InstallationProgressManager:
 
 # === NOTIFICATION SERVICE === #
 
+# .format di-bind sekali saat import supaya tidak lookup atribut per kirim
+_NOTIFY_STARTED = Messages.NOTIFICATION_INSTALL_STARTED.format
+_NOTIFY_PROGRESS = Messages.NOTIFICATION_INSTALL_PROGRESS.format
+_NOTIFY_COMPLETED = Messages.NOTIFICATION_INSTALL_COMPLETED.format
+_NOTIFY_FAILED = Messages.NOTIFICATION_INSTALL_FAILED.format
+_NOTIFY_TIMEOUT = Messages.NOTIFICATION_INSTALL_TIMEOUT.format
+
+
 class NotificationService:
     """Service untuk mengirim notifikasi cross-platform"""
-    
+
+    # Step yang dianggap major; regex alternation di-compile sekali
+    # saat class load, satu scan case-insensitive per notifikasi
+    _MAJOR_STEPS_RE = re.compile(
+        '|'.join(re.escape(s) for s in (
+            Settings.INSTALL_STATUS_CHECKING,
+            Settings.INSTALL_STATUS_INSTALLING,
+            Settings.INSTALL_STATUS_MONITORING
+        )),
+        re.IGNORECASE
+    )
+
     def __init__(self, bot: Bot = None):
         self.bot = bot
         self.user_db = None
         self.install_db = None
-    
+        # Cache user_id -> telegram_id (None = user tanpa telegram),
+        # di-invalidate saat instalasi selesai/gagal/timeout
+        self._tg_cache: Dict[int, Optional[int]] = {}
+        # Dihitung sekali di set_databases; deployment API-only tanpa bot
+        # langsung no-op tanpa menyentuh DB
+        self._ready = False
+
     def set_databases(self, user_db, install_db):
         """Set database instances"""
         self.user_db = user_db
         self.install_db = install_db
-    
+        self._ready = bool(self.bot and user_db)
+
+    async def _telegram_id(self, user_id: int) -> Optional[int]:
+        """Resolve telegram_id user, di-cache selama instalasi berjalan"""
+        if user_id in self._tg_cache:
+            return self._tg_cache[user_id]
+        user = await self.user_db.get_user_by_id(user_id)
+        telegram_id = user.get('telegram_id') if user else None
+        self._tg_cache[user_id] = telegram_id
+        return telegram_id
+
+    async def _notify(self, user_id: int, fmt, label: str, **kwargs):
+        """Kirim satu notifikasi API ke telegram user (pola bersama notify_*)"""
+        if not self._ready:
+            return
+        telegram_id = await self._telegram_id(user_id)
+        if not telegram_id:
+            return
+        try:
+            await self.bot.send_message(telegram_id, fmt(**kwargs))
+            logger.info(f"Sent {label} notification to telegram_id {telegram_id}")
+        except TelegramError as e:
+            logger.error(f"Failed to send {label} notification: {e}")
+
     async def notify_installation_started(
-        self, 
-        user_id: int, 
-        install_id: str, 
-        ip: str, 
+        self,
+        user_id: int,
+        install_id: str,
+        ip: str,
         os_name: str,
         source: str = "telegram"
     ):
         """Notifikasi instalasi dimulai"""
-        if source == "api" and self.user_db:
-            user = await self.user_db.get_user_by_id(user_id)
-            if user and user.get('telegram_id') and self.bot:
-                try:
-                    message = Messages.NOTIFICATION_INSTALL_STARTED.format(
-                        ip=ip,
-                        os_name=os_name,
-                        install_id=install_id
-                    )
-                    await self.bot.send_message(user['telegram_id'], message)
-                    logger.info(f"Sent start notification to telegram_id {user['telegram_id']}")
-                except TelegramError as e:
-                    logger.error(f"Failed to send telegram notification: {e}")
-    
+        if source == "api":
+            await self._notify(
+                user_id, _NOTIFY_STARTED, "start",
+                ip=ip, os_name=os_name, install_id=install_id
+            )
+
     async def notify_installation_progress(
         self,
         user_id: int,
@@ -202,26 +326,12 @@ class NotificationService:
         source: str = "telegram"
     ):
         """Notifikasi progress instalasi"""
-        if source == "api" and self.user_db:
-            user = await self.user_db.get_user_by_id(user_id)
-            if user and user.get('telegram_id') and self.bot:
-                try:
-                    major_steps = [
-                        Settings.INSTALL_STATUS_CHECKING,
-                        Settings.INSTALL_STATUS_INSTALLING,
-                        Settings.INSTALL_STATUS_MONITORING
-                    ]
-                    
-                    if any(s in step.lower() for s in major_steps):
-                        message = Messages.NOTIFICATION_INSTALL_PROGRESS.format(
-                            ip=ip,
-                            step=step
-                        )
-                        await self.bot.send_message(user['telegram_id'], message)
-                        logger.info(f"Sent progress notification to telegram_id {user['telegram_id']}")
-                except TelegramError as e:
-                    logger.error(f"Failed to send progress notification: {e}")
-    
+        if source == "api" and self._MAJOR_STEPS_RE.search(step):
+            await self._notify(
+                user_id, _NOTIFY_PROGRESS, "progress",
+                ip=ip, step=step
+            )
+
     async def notify_installation_completed(
         self,
         user_id: int,
@@ -231,19 +341,13 @@ class NotificationService:
         source: str = "telegram"
     ):
         """Notifikasi instalasi selesai"""
-        if source == "api" and self.user_db:
-            user = await self.user_db.get_user_by_id(user_id)
-            if user and user.get('telegram_id') and self.bot:
-                try:
-                    message = Messages.NOTIFICATION_INSTALL_COMPLETED.format(
-                        ip=ip,
-                        password=rdp_password
-                    )
-                    await self.bot.send_message(user['telegram_id'], message)
-                    logger.info(f"Sent completion notification to telegram_id {user['telegram_id']}")
-                except TelegramError as e:
-                    logger.error(f"Failed to send completion notification: {e}")
-    
+        if source == "api":
+            await self._notify(
+                user_id, _NOTIFY_COMPLETED, "completion",
+                ip=ip, password=rdp_password
+            )
+        self._tg_cache.pop(user_id, None)
+
     async def notify_installation_failed(
         self,
         user_id: int,
@@ -253,19 +357,13 @@ class NotificationService:
         source: str = "telegram"
     ):
         """Notifikasi instalasi gagal"""
-        if source == "api" and self.user_db:
-            user = await self.user_db.get_user_by_id(user_id)
-            if user and user.get('telegram_id') and self.bot:
-                try:
-                    message = Messages.NOTIFICATION_INSTALL_FAILED.format(
-                        ip=ip,
-                        error=error[:200]
-                    )
-                    await self.bot.send_message(user['telegram_id'], message)
-                    logger.info(f"Sent failure notification to telegram_id {user['telegram_id']}")
-                except TelegramError as e:
-                    logger.error(f"Failed to send failure notification: {e}")
-    
+        if source == "api":
+            await self._notify(
+                user_id, _NOTIFY_FAILED, "failure",
+                ip=ip, error=error[:200]
+            )
+        self._tg_cache.pop(user_id, None)
+
     async def notify_installation_timeout(
         self,
         user_id: int,
@@ -274,15 +372,12 @@ class NotificationService:
         source: str = "telegram"
     ):
         """Notifikasi instalasi timeout"""
-        if source == "api" and self.user_db:
-            user = await self.user_db.get_user_by_id(user_id)
-            if user and user.get('telegram_id') and self.bot:
-                try:
-                    message = Messages.NOTIFICATION_INSTALL_TIMEOUT.format(ip=ip)
-                    await self.bot.send_message(user['telegram_id'], message)
-                    logger.info(f"Sent timeout notification to telegram_id {user['telegram_id']}")
-                except TelegramError as e:
-                    logger.error(f"Failed to send timeout notification: {e}")
+        if source == "api":
+            await self._notify(
+                user_id, _NOTIFY_TIMEOUT, "timeout",
+                ip=ip
+            )
+        self._tg_cache.pop(user_id, None)
 
 
 # === UTILITY FUNCTIONS === #
@@ -311,6 +406,9 @@ async def safe_edit_message(message, new_text: str):
 async def send_or_edit_message(message, new_text: str, delete_old: bool = False):
     """Send new message or edit existing one"""
     try:
+        # Teks tidak berubah: tidak perlu round-trip delete/edit sama sekali
+        if message and getattr(message, 'text', None) == new_text:
+            return message
         if delete_old and message:
             await message.delete()
             return await message.get_bot().send_message(
@@ -328,26 +426,31 @@ def chunk_message(text: str, max_length: int = 4000) -> list:
     """Split long message into chunks"""
     if len(text) <= max_length:
         return [text]
-    
+
+    # Kumpulkan baris per chunk lalu join sekali (hindari concat kuadratik)
     chunks = []
-    current_chunk = ""
-    
+    current_lines = []
+    current_len = 0
+
     for line in text.split('\n'):
-        if len(current_chunk) + len(line) + 1 <= max_length:
-            current_chunk += line + '\n'
+        if current_len + len(line) + 1 <= max_length:
+            current_lines.append(line)
+            current_len += len(line) + 1
         else:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = line + '\n'
-    
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    
+            if current_lines:
+                chunks.append('\n'.join(current_lines).strip())
+            current_lines = [line]
+            current_len = len(line) + 1
+
+    if current_lines:
+        chunks.append('\n'.join(current_lines).strip())
+
     return chunks
 
 
 # === FORMATTER FUNCTIONS === #
 
+@lru_cache(maxsize=256)
 def format_size(size_mb: int) -> str:
     """Format ukuran dari MB ke GB jika perlu"""
     if size_mb >= 1024:
@@ -355,23 +458,30 @@ def format_size(size_mb: int) -> str:
     return f"{size_mb}MB"
 
 
+# Dibangun sekali saat import, bukan per panggilan
+_STATUS_MAP = {
+    Settings.INSTALL_STATUS_COMPLETED: "[COMPLETED]",
+    Settings.INSTALL_STATUS_FAILED: "[FAILED]",
+    Settings.INSTALL_STATUS_TIMEOUT: "[TIMEOUT]",
+    Settings.INSTALL_STATUS_MONITORING: "[MONITORING]",
+    Settings.INSTALL_STATUS_INSTALLING: "[INSTALLING]"
+}
+
+
 def format_installation_status(status: str) -> str:
     """Format status instalasi untuk display"""
-    status_map = {
-        Settings.INSTALL_STATUS_COMPLETED: "[COMPLETED]",
-        Settings.INSTALL_STATUS_FAILED: "[FAILED]",
-        Settings.INSTALL_STATUS_TIMEOUT: "[TIMEOUT]",
-        Settings.INSTALL_STATUS_MONITORING: "[MONITORING]",
-        Settings.INSTALL_STATUS_INSTALLING: "[INSTALLING]"
-    }
-    return status_map.get(status, "[IN PROGRESS]")
+    return _STATUS_MAP.get(status, "[IN PROGRESS]")
 
 
 def format_time_elapsed(start_time, end_time=None) -> str:
-    """Format waktu yang telah berlalu"""
+    """Format waktu yang telah berlalu
+
+    start_time harus dari time.monotonic() (sumber clock yang sama
+    dengan loop.time() di event loop default CPython).
+    """
     if end_time is None:
-        end_time = asyncio.get_event_loop().time()
-    
+        end_time = time.monotonic()
+
     elapsed = end_time - start_time
     minutes = int(elapsed // 60)
     seconds = int(elapsed % 60)
@@ -215,6 +215,7 @@ Admin Commands:
     ERROR_INVALID_IP = "Invalid IP address format."
     ERROR_INVALID_PASSWORD = "Password requirements:\n- Minimum 8 characters\n- Must contain uppercase letter\n- Must contain lowercase letter\n- Must contain number"
     ERROR_INVALID_OS = "Invalid OS code. Use /oslist to see available options."
+    ERROR_INSTALL_IN_PROGRESS = "An installation to this IP is already in progress. Use /history to check its status."
     
     # Other
     UNKNOWN_COMMAND = "Unknown command. Use /help for available commands."